@@ -20,6 +20,644 @@ class IsolationTest(unittest.TestCase):
         self.player2 = "Player2"
         self.game = isolation.Board(self.player1, self.player2)
 
+    def test_board_moves(self):
+        """Knight moves are clipped at the edges and blocked cells are removed
+        from the legal moves and blank spaces."""
+        self.assertEqual(len(self.game.get_legal_moves()), 49)
+        self.game.apply_move((0, 0))
+        self.game.apply_move((2, 1))
+        self.assertEqual(len(self.game.get_blank_spaces()), 47)
+        self.assertEqual(sorted(self.game.get_legal_moves()), [(1, 2)])
+        self.assertEqual(sorted(self.game.get_legal_moves(self.player2)),
+                         [(0, 2), (1, 3), (3, 3), (4, 0), (4, 2)])
+        self.assertFalse(self.game.move_is_legal((2, 1)))
+
+    def test_mobility(self):
+        """Move counts and the combined terminal/mobility query agree with the
+        move lists and the utility."""
+        self.assertEqual(self.game.count_legal_moves(), 49)
+        self.game.apply_move((0, 0))
+        self.game.apply_move((2, 1))
+        self.assertEqual(self.game.count_legal_moves(), 1)
+        self.assertEqual(self.game.count_legal_moves(self.player2), 5)
+        self.assertEqual(self.game.get_mobility(self.player2), (0., 5, 1))
+        while self.game.has_legal_moves():
+            self.game.apply_move(self.game.get_legal_moves()[0])
+        loser, winner = self.game.active_player, self.game.inactive_player
+        opp_moves = len(self.game.get_legal_moves(winner))
+        self.assertEqual(self.game.get_mobility(loser),
+                         (float("-inf"), 0, opp_moves))
+        self.assertEqual(self.game.get_mobility(winner),
+                         (float("inf"), opp_moves, 0))
+
+    def test_position_tables(self):
+        """Positional lookup tables match the distances computed from the
+        coordinates, including on non-square boards."""
+        tables = isolation.isolation.position_tables(5, 3)
+        self.assertIs(tables, isolation.isolation.position_tables(5, 3))
+        game = isolation.Board(self.player1, self.player2, width=5, height=3)
+        game.apply_move((2, 4))
+        game.apply_move((0, 1))
+        own, opp = game.get_index_cell(0), game.get_index_cell(1)
+        self.assertEqual((own, opp), (14, 3))
+        self.assertEqual(tables.center_sq[own], (1.5 - 2)**2 + (2.5 - 4)**2)
+        self.assertEqual(tables.center_abs[own], 0.5 + 1.5)
+        self.assertEqual(tables.pair_sq[own * tables.cells + opp], 4 + 9)
+
+    def test_weighted_score(self):
+        """A picklable weighted heuristic reproduces the custom heuristics."""
+        import pickle
+        score_fn = pickle.loads(pickle.dumps(game_agent.WeightedScore(
+            own_moves=1.5, center_sq=-1.75, pair_sq=-0.7)))
+        self.game.apply_move((2, 4))
+        self.game.apply_move((0, 1))
+        for game in [self.game.forecast_move(m) for m in self.game.get_legal_moves()]:
+            for player in (self.player1, self.player2):
+                self.assertEqual(score_fn(game, player),
+                                 game_agent.custom_score(game, player))
+        self.assertRaises(ValueError, game_agent.WeightedScore, mobility=1.)
+
+    def test_board_sizes(self):
+        """Move tables are shared between boards of the same size and still
+        handle non-square boards."""
+        other = isolation.Board(self.player1, self.player2)
+        self.assertIs(self.game._neighbours, other._neighbours)
+        game = isolation.Board(self.player1, self.player2, width=3, height=5)
+        game.apply_move((4, 2))
+        game.apply_move((0, 0))
+        self.assertEqual(sorted(game.get_legal_moves()), [(2, 1), (3, 0)])
+
+    def test_board_copy(self):
+        """Forecasting a move leaves the original board unchanged."""
+        self.game.apply_move((3, 3))
+        self.game.apply_move((0, 0))
+        new_game = self.game.forecast_move((1, 2))
+        self.assertEqual(self.game.get_player_location(self.player1), (3, 3))
+        self.assertEqual(new_game.get_player_location(self.player1), (1, 2))
+        self.assertTrue(self.game.move_is_legal((1, 2)))
+        self.assertFalse(new_game.move_is_legal((1, 2)))
+        self.assertEqual(new_game.active_player, self.player2)
+
+    def test_player_index(self):
+        """Players are tracked by index without calling their __eq__."""
+        class Player(object):
+            def __eq__(self, other):
+                raise AssertionError("__eq__ should not be called")
+            __hash__ = object.__hash__
+
+        player1, player2 = Player(), Player()
+        game = isolation.Board(player1, player2)
+        game.apply_move((0, 0))
+        self.assertEqual(game.player_index(player2), 1)
+        self.assertEqual(game.active_index, 1)
+        self.assertIs(game.active_player, player2)
+        self.assertIs(game.get_opponent(player2), player1)
+        self.assertEqual(game.get_player_location(player1), (0, 0))
+        self.assertEqual(game.get_index_location(1), None)
+        self.assertEqual(len(game.get_index_legal_moves(1)), 48)
+        self.assertFalse(game.is_winner(player1))
+        self.assertFalse(hasattr(game, "__dict__"))
+        self.assertRaises(RuntimeError, self.game.player_index, object())
+
+    def test_push_pop_move(self):
+        """pop_move restores exactly the state before the matching push_move."""
+        self.game.apply_move((3, 3))
+        before = self.game.to_string()
+        self.game.push_move((0, 0))
+        self.game.push_move((1, 1))
+        self.assertEqual(self.game.active_player, self.player2)
+        self.game.pop_move()
+        self.game.pop_move()
+        self.assertEqual(self.game.to_string(), before)
+        self.assertEqual(self.game.active_player, self.player2)
+        self.assertEqual(self.game.move_count, 1)
+        self.assertRaises(RuntimeError, self.game.pop_move)
+
+    def test_board_hash(self):
+        """Transposed move orders share a hash that is restored by pop_move
+        and preserved by copy, while swapping the players changes it."""
+        opp_moves = [(6, 6), (4, 5), (6, 4), (5, 6)]
+        paths = [[(2, 2), (0, 3), (2, 4), (4, 3)],
+                 [(2, 4), (0, 3), (2, 2), (4, 3)]]
+        hashes = []
+        for path in paths:
+            game = isolation.Board(self.player1, self.player2)
+            for move, opp_move in zip(path, opp_moves):
+                game.apply_move(move)
+                game.apply_move(opp_move)
+            hashes.append(game.hash())
+        self.assertEqual(hashes[0], hashes[1])
+        self.assertEqual(game.copy().hash(), game.hash())
+        game.push_move((2, 1))
+        self.assertNotEqual(game.hash(), hashes[0])
+        game.pop_move()
+        self.assertEqual(game.hash(), hashes[0])
+
+        self.game.apply_move((0, 0))
+        self.game.apply_move((6, 6))
+        swapped = isolation.Board(self.player1, self.player2)
+        swapped.apply_move((6, 6))
+        swapped.apply_move((0, 0))
+        self.assertNotEqual(self.game.hash(), swapped.hash())
+
+    def test_search_leaves_board_unchanged(self):
+        """Searching with push_move/pop_move does not modify the input board."""
+        player = game_agent.AlphaBetaPlayer()
+        player.time_left = lambda: 1000.
+        game = isolation.Board(player, self.player2)
+        game.apply_move((3, 3))
+        game.apply_move((2, 3))
+        before = game.to_string()
+        self.assertIn(player.alphabeta(game, 3), game.get_legal_moves())
+        self.assertEqual(game.to_string(), before)
+
+    def test_transposition_table(self):
+        """Deeper entries are kept in the depth-preferred slot while shallower
+        entries for other positions go to the always-replace slot."""
+        table = game_agent.TranspositionTable(max_entries=8)
+        self.assertEqual(table.max_entries, 8)
+        table.store(1, 5, 1., game_agent.EXACT, (0, 0))
+        table.store(5, 2, 2., game_agent.LOWER, (1, 1))
+        table.store(9, 1, 3., game_agent.UPPER, (2, 2))
+        self.assertEqual(table.probe(1), (1, 5, 1., game_agent.EXACT, (0, 0)))
+        self.assertIsNone(table.probe(5))
+        self.assertEqual(table.probe(9)[2], 3.)
+        table.store(13, 6, 4., game_agent.EXACT, (3, 3))
+        self.assertIsNone(table.probe(1))
+        self.assertEqual(table.probe(13)[1], 6)
+        self.assertEqual((table.probes, table.hits), (5, 3))
+
+    def test_move_ordering(self):
+        """The PV move comes first, then killers, then moves by history."""
+        orderer = game_agent.MoveOrderer()
+        orderer.record_cutoff((1, 1), 2, 0, 3, 0)
+        orderer.record_cutoff((2, 2), 4, 0, 1, 2)
+        orderer.record_cutoff((3, 3), 2, 0, 1, 1)
+        moves = [(0, 0), (1, 1), (2, 2), (3, 3), (4, 4)]
+        self.assertEqual(orderer.order(list(moves), 2, 0),
+                         [(3, 3), (1, 1), (2, 2), (0, 0), (4, 4)])
+        self.assertEqual(orderer.order(list(moves), 2, 0, (4, 4))[:2],
+                         [(4, 4), (3, 3)])
+        self.assertEqual(orderer.order(list(moves), 1, 1), moves)
+        self.assertAlmostEqual(orderer.first_move_cutoff_rate, 1 / 3)
+        orderer.new_search()
+        self.assertEqual(orderer.cutoffs, 0)
+        self.assertEqual(orderer.order(list(moves), 2, 0)[0], (1, 1))
+
+    def test_iterative_deepening_terminates(self):
+        """Iterative deepening returns once the game tree is fully solved,
+        even when the clock never runs out."""
+        player = game_agent.AlphaBetaPlayer()
+        game = isolation.Board(player, self.player2, width=4, height=4)
+        game.apply_move((0, 0))
+        game.apply_move((3, 3))
+        depths = []
+        search = player._aspiration_root
+        player._aspiration_root = lambda game, depth, guess: (
+            depths.append(depth) or search(game, depth, guess))
+        move = player.get_move(game, lambda: 1e6)
+        self.assertIn(move, game.get_legal_moves())
+        self.assertEqual(depths, list(range(1, len(depths) + 1)))
+        self.assertLessEqual(len(depths), 14)
+
+    def test_spsa(self):
+        """SPSA steps follow the gain schedule, and a run resumed from its
+        checkpoint ends with the weights and random state of an
+        uninterrupted run."""
+        import contextlib
+        import io
+        import json
+        import os
+        import tempfile
+        import tune
+
+        class Interrupted(object):
+            """Pool stand-in that plays one iteration and then stops the run."""
+            calls = 0
+
+            def map(self, fn, tasks, chunksize=1):
+                self.calls += 1
+                if self.calls > 1:
+                    raise KeyboardInterrupt
+                return list(map(fn, tasks))
+
+        config = {"start": dict(own_moves=1., opp_moves=-1., center_sq=0.,
+                                center_abs=0., pair_sq=0.),
+                  "features": ["own_moves", "opp_moves"], "iterations": 2,
+                  "pairs": 1, "a": 0.2, "c": 0.25, "seed": 3}
+
+        def new_state():
+            return {"config": config, "iteration": 0, "rng": None,
+                    "weights": dict(config["start"]), "history": []}
+
+        self.assertEqual(tune.gains(config, 0), (0.2 / 1.2 ** 0.602, 0.25))
+        fd, path = tempfile.mkstemp()
+        os.close(fd)
+        self.addCleanup(os.remove, path)
+        with contextlib.redirect_stdout(io.StringIO()):
+            full = tune.spsa(new_state(), None, 1, 150, 100)
+            with self.assertRaises(KeyboardInterrupt):
+                tune.spsa(new_state(), Interrupted(), 1, 150, 100, path)
+            with open(path) as f:
+                saved = json.load(f)
+            self.assertEqual(saved["iteration"], 1)
+            resumed = tune.spsa(saved, None, 1, 150, 100, path)
+
+        self.assertEqual(json.loads(json.dumps(resumed)),
+                         json.loads(json.dumps(full)))
+        weights = config["start"]
+        for k, step in enumerate(full["history"]):
+            a_k, c_k = tune.gains(config, k)
+            for name in config["features"]:
+                self.assertAlmostEqual(abs(step["weights"][name] - weights[name]),
+                                       a_k * abs(step["score"]) / (2 * c_k))
+            weights = step["weights"]
+
+    def test_batch_scores(self):
+        """Vectorized heuristics agree with the scalar versions, including
+        won and lost states."""
+        import batch_scores
+        self.game.apply_move((0, 0))
+        self.game.apply_move((2, 2))
+        self.game.apply_move((1, 2))
+        self.game.apply_move((0, 3))
+        self.game.apply_move((2, 1))
+        games = [self.game.forecast_move(m) for m in self.game.get_legal_moves()]
+        games.append(self.game)
+        for batch_fn, score_fn in [(batch_scores.custom_score, game_agent.custom_score),
+                                   (batch_scores.custom_score_3, game_agent.custom_score_3)]:
+            for player in (self.player1, self.player2):
+                expected = [score_fn(game, player) for game in games]
+                actual = batch_fn(batch_scores.leaves(games, player)).tolist()
+                self.assertEqual(actual, expected)
+
+    def test_node_limit(self):
+        """A node budget stops the search without consulting a short clock,
+        and the clock is read far less often than once per node."""
+        calls = []
+
+        def time_left():
+            calls.append(1)
+            return 1e6
+
+        player = game_agent.AlphaBetaPlayer(node_limit=500)
+        game = isolation.Board(player, self.player2)
+        game.apply_move((3, 3))
+        game.apply_move((2, 3))
+        self.assertIn(player.get_move(game, time_left), game.get_legal_moves())
+        self.assertEqual(player.nodes, 501)
+        self.assertLess(len(calls), 50)
+
+    def test_search_stats(self):
+        """get_move records statistics for every completed iteration."""
+        player = game_agent.AlphaBetaPlayer()
+        game = isolation.Board(player, self.player2, width=5, height=5)
+        game.apply_move((2, 2))
+        game.apply_move((0, 0))
+        player.get_move(game, lambda: 1e6)
+        stats = player.stats
+        self.assertEqual(player.stats_log, [stats])
+        self.assertEqual(stats.move_count, 2)
+        self.assertEqual(stats.nodes, player.nodes)
+        self.assertEqual(len(stats.iteration_times), stats.depth)
+        self.assertGreater(stats.depth, 1)
+        self.assertGreater(stats.leaves, 0)
+        self.assertGreaterEqual(stats.tt_probes, stats.tt_hits)
+
+    def test_perft(self):
+        """Move generation and make/unmake reproduce the perft counts of the
+        small benchmark positions."""
+        import benchmark
+        for position in benchmark.PERFT_POSITIONS[:3]:
+            game = benchmark.make_board(position)
+            counts = [benchmark.perft(game, d) for d in range(1, 6)]
+            self.assertEqual(counts, position.counts[:5], position.name)
+
+    def test_endgame_solver(self):
+        """Partitioned boards are detected by flood fill and played along the
+        longest knight's path of the player's own region."""
+        player = game_agent.AlphaBetaPlayer()
+        game = isolation.Board(player, self.player2, width=5, height=5)
+        for move in [(3, 2), (4, 0), (2, 0), (2, 1), (0, 1), (4, 2), (2, 2)]:
+            self.assertFalse(game.is_partitioned())
+            game.apply_move(move)
+        game.apply_move((3, 4))
+        self.assertTrue(game.is_partitioned())
+        self.assertFalse(game.get_region_mask(player) &
+                         game.get_region_mask(self.player2))
+        move = player.get_move(game, lambda: 1e6)
+        self.assertIn(move, game.get_legal_moves())
+        self.assertTrue(player.stats.endgame)
+        self.assertEqual(player.stats.depth, 14)
+
+    def test_opening_book(self):
+        """Book moves are found by position hash and played without search."""
+        import os
+        import tempfile
+        from isolation.book import OpeningBook, write_book
+        self.game.apply_move((3, 3))
+        self.game.apply_move((2, 3))
+        fd, path = tempfile.mkstemp()
+        os.close(fd)
+        self.addCleanup(os.remove, path)
+        write_book(path, 7, 7, {self.game.hash(): (1, 4)})
+        book = OpeningBook(path)
+        self.addCleanup(book.close)
+        self.assertEqual(len(book), 1)
+        self.assertEqual(book.get_move(self.game), (1, 4))
+        self.assertIsNone(book.get_move(self.game.forecast_move((1, 4))))
+
+        # An open cell that the active knight cannot reach (as after a hash
+        # collision) is not returned
+        game = self.game.forecast_move((1, 4)).forecast_move((0, 2))
+        write_book(path, 7, 7, {game.hash(): (0, 0)})
+        book.close()
+        self.assertTrue(game.move_is_legal((0, 0)))
+        self.assertNotIn((0, 0), game.get_legal_moves())
+        self.assertIsNone(book.get_move(game))
+        write_book(path, 7, 7, {game.hash(): (2, 2)})
+        book.close()
+        self.assertIn((2, 2), game.get_legal_moves())
+        self.assertEqual(book.get_move(game), (2, 2))
+
+        player = game_agent.AlphaBetaPlayer(book=book)
+        game = isolation.Board(player, self.player2)
+        game.apply_move((3, 3))
+        game.apply_move((2, 3))
+        self.assertEqual(player.get_move(game, lambda: 1e6), (1, 4))
+        self.assertEqual(player.nodes, 0)
+
+    def test_game_records(self):
+        """Games written to a record file are read back one at a time and
+        replayed move by move, and an unfinished last record is dropped."""
+        import os
+        import tempfile
+        from isolation.records import (GameRecord, MoveStats, RecordWriter,
+                                       read_records, replay)
+        game = isolation.Board(self.player1, self.player2)
+        moves = []
+        while game.get_legal_moves():
+            move = sorted(game.get_legal_moves())[0]
+            moves.append(move)
+            game.apply_move(move)
+        searches = len(moves) - 1
+        stats = [MoveStats(3, 100, 60, 20, False), None] * searches
+        record = GameRecord(7, 7, ("AB_Custom", "Random"), -1, 4,
+                            "illegal move", 1 - game.active_index, 2, moves,
+                            [float(ms) for ms in range(searches)],
+                            stats[:searches])
+        plain = record._replace(move_times=None, stats=None)
+
+        fd, path = tempfile.mkstemp()
+        os.close(fd)
+        self.addCleanup(os.remove, path)
+        os.remove(path)
+        writer = RecordWriter(path)
+        writer.write(record)
+        writer.write(plain)
+        with self.assertRaises(ValueError):
+            writer.write(record._replace(stats=record.stats[:-1]))
+        writer.close()
+        self.assertEqual(list(read_records(path)), [record, plain])
+
+        with open(path, "ab") as f:
+            f.write(b"\x40\x00\x00\x00\x07\x07")
+        self.assertEqual(len(list(read_records(path))), 2)
+        writer = RecordWriter(path)
+        writer.write(plain)
+        writer.close()
+        records = read_records(path)
+        self.assertEqual(next(records), record)
+        self.assertEqual(list(records), [plain, plain])
+
+        replayed = []
+        for board, move in replay(record):
+            self.assertTrue(board.move_is_legal(move))
+            replayed.append(move)
+        self.assertEqual(replayed, moves)
+        self.assertEqual(board.to_string(), game.to_string())
+
+    def test_pondering(self):
+        """A pondering player searches in a helper process after its move,
+        and stops when its next turn starts."""
+        import time
+        player = game_agent.AlphaBetaPlayer(ponder=True, node_limit=2000)
+        self.addCleanup(player.close)
+        game = isolation.Board(player, self.player2)
+        game.apply_move((3, 3))
+        game.apply_move((2, 3))
+        game.apply_move(player.get_move(game, lambda: 1e6))
+        self.assertTrue(player._pondering)
+        # The node limit ends the ponder search; give the helper time to run
+        time.sleep(0.5)
+        game.apply_move(game.get_legal_moves()[0])
+        player.get_move(game, lambda: 1e6)
+        self.assertGreater(player.stats.ponder_depth, 0)
+        player.stop_pondering()
+        self.assertFalse(player._pondering)
+
+    def test_principal_variation_search(self):
+        """Null-window and aspiration searches find the same root values as
+        full-window alpha-beta, and count their re-searches."""
+        values = []
+        for pvs, aspiration in [(False, 0.), (True, 0.5)]:
+            player = game_agent.AlphaBetaPlayer(pvs=pvs, aspiration=aspiration)
+            game = isolation.Board(player, self.player2)
+            for move in [(3, 3), (2, 3), (1, 2), (4, 4), (3, 1)]:
+                game.apply_move(move)
+            player._start_clock(lambda: 1e6)
+            guess = None
+            for depth in range(1, 6):
+                _, guess = player._aspiration_root(game, depth, guess)
+                values.append((depth, guess))
+        self.assertEqual(values[:5], values[5:])
+        self.assertGreater(player.researches + player.fail_lows +
+                           player.fail_highs, 0)
+
+    def test_parallel_search(self):
+        """The shared transposition table round-trips entries, and a player
+        with a helper process plays legal moves and reports its depth."""
+        table = game_agent.SharedTranspositionTable(1 << 8)
+        table.store(12345, 4, -1.5, game_agent.LOWER, (3, 2))
+        table.store(67890, 0, float("-inf"), game_agent.EXACT, None)
+        self.assertEqual(table.probe(12345), (12345, 4, -1.5, game_agent.LOWER, (3, 2)))
+        self.assertEqual(table.probe(67890)[2:], (float("-inf"), game_agent.EXACT, None))
+        self.assertIsNone(table.probe(12345 + (1 << 8)))
+        table.clear()
+        self.assertIsNone(table.probe(12345))
+
+        player = game_agent.AlphaBetaPlayer(smp_workers=1)
+        game = isolation.Board(player, self.player2)
+        game.apply_move((3, 3))
+        game.apply_move((2, 3))
+        try:
+            for _ in range(2):
+                move = player.get_move(game, lambda: 1e6 if player.nodes < 5000 else 0.)
+                self.assertTrue(game.move_is_legal(move))
+                self.assertGreater(player.stats.helper_depth, 0)
+                game.apply_move(move)
+                game.apply_move(game.get_legal_moves()[0])
+        finally:
+            player.close()
+        self.assertIsNone(player._helpers)
+
+    def test_game_log(self):
+        """A tournament resumed from its game log skips the logged games,
+        rebuilds the tallies from the log, and ignores an unfinished last
+        line."""
+        import json
+        import os
+        import tempfile
+        import tournament
+        from sample_players import improved_score
+
+        class Unplayable(object):
+            def get_move(self, game, time_left):
+                raise AssertionError("a logged game was played again")
+
+        fd, path = tempfile.mkstemp()
+        os.close(fd)
+        self.addCleanup(os.remove, path)
+        os.remove(path)
+
+        cpu_agent = tournament.Agent(game_agent.AlphaBetaPlayer(
+            score_fn=improved_score, node_limit=100), "AB_Improved")
+        test_agent = tournament.Agent(
+            game_agent.AlphaBetaPlayer(node_limit=100), "AB_Custom")
+        wins = {cpu_agent.player: 0, test_agent.player: 0}
+        log = tournament.GameLog(path)
+        tournament.play_round(cpu_agent, [test_agent], wins, 2, log=log, seed=5)
+        log.close()
+        tallies = [wins[test_agent.player], wins[cpu_agent.player]]
+        with open(path) as f:
+            logged = [json.loads(line) for line in f]
+        self.assertEqual(len(logged), 4)
+        with open(path, "a") as f:
+            f.write('{"agent": "AB_Custom", "opponent": "AB_Imp')
+
+        # Every game is in the log, so none is played again
+        cpu_agent = tournament.Agent(Unplayable(), "AB_Improved")
+        test_agent = tournament.Agent(Unplayable(), "AB_Custom")
+        resumed = {cpu_agent.player: 0, test_agent.player: 0}
+        log = tournament.GameLog(path)
+        self.assertEqual(len(log.records), 4)
+        self.assertIn(tournament.game_key(logged[0]), log)
+        tournament.play_round(cpu_agent, [test_agent], resumed, 2, log=log,
+                              seed=5)
+        self.assertEqual([resumed[test_agent.player],
+                          resumed[cpu_agent.player]], tallies)
+        self.assertEqual(tallies[0], sum(record["won"] for record in logged))
+
+        # New games are appended on a line of their own after the unfinished one
+        record = dict(logged[0], seed=6)
+        log.append(record)
+        log.close()
+        log = tournament.GameLog(path)
+        log.close()
+        self.assertEqual(len(log.records), 5)
+        self.assertIn(tournament.game_key(record), log)
+
+    def test_sprt(self):
+        """The SPRT log-likelihood ratio matches a hand-computed value, the
+        test stops at the first pair that crosses a Wald bound, and pair
+        scores without spread still give a proper interval."""
+        import contextlib
+        import io
+        import tournament
+
+        class Resign(object):
+            def get_move(self, game, time_left):
+                return None
+
+        # 30 wins and 20 losses with s0 = 0.5 and s1 = 0.571463 (50 Elo):
+        # 30 * ln(s1 / 0.5) + 20 * ln((1 - s1) / 0.5)
+        self.assertAlmostEqual(tournament.sprt_llr(30, 20, 0., 50.), 0.92313,
+                               places=4)
+
+        # Each won pair adds 2 * ln(s1 / 0.5) = 0.2672 to the LLR, so the
+        # bound ln(0.95 / 0.05) = 2.944 is first crossed after 12 pairs; each
+        # lost pair adds 2 * ln((1 - s1) / 0.5) = -0.3084, which needs 10
+        winner = tournament.Agent(game_agent.AlphaBetaPlayer(node_limit=200), "AB")
+        loser = tournament.Agent(Resign(), "Resign")
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = tournament.run_sprt(winner, loser, 0., 50.)
+        self.assertEqual((result.decision, result.pairs, result.wins,
+                          result.losses), ("H1", 12, 24, 0))
+        self.assertGreaterEqual(result.llr, result.bounds[1])
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = tournament.run_sprt(loser, winner, 0., 50.)
+        self.assertEqual((result.decision, result.pairs), ("H0", 10))
+        self.assertLessEqual(result.llr, result.bounds[0])
+
+        elo, (low, high) = tournament.elo_interval([1.] * 12)
+        self.assertTrue(0 < low < elo < 1000)
+        elo, (low, high) = tournament.elo_interval([0.5] * 12)
+        self.assertEqual(elo, 0.)
+        self.assertTrue(-1000 < low < 0 < high < 1000)
+
+    def test_parallel_tournament(self):
+        """Seeded games give the same records and tallies whether they are
+        played in one process or by a pool of worker processes."""
+        import multiprocessing
+        import os
+        import tournament
+        from sample_players import improved_score
+        import warnings
+        cores = tournament.physical_cores()
+        self.assertTrue(1 <= cores <= os.cpu_count())
+        self.assertEqual(tournament.worker_count(0), cores)
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter("always")
+            self.assertEqual(tournament.worker_count(cores + 1), cores)
+        self.assertEqual(len(caught), 1)
+
+        def play(pool):
+            cpu_agent = tournament.Agent(game_agent.AlphaBetaPlayer(
+                score_fn=improved_score, node_limit=100), "AB_Improved")
+            test_agent = tournament.Agent(
+                game_agent.AlphaBetaPlayer(node_limit=100), "AB_Custom")
+            records = tournament.play_games(
+                [(test_agent, cpu_agent, match) for match in range(2)],
+                pool, seed=7)
+            wins = {cpu_agent.player: 0, test_agent.player: 0}
+            tournament.play_round(cpu_agent, [test_agent], wins, 2, pool,
+                                  seed=7)
+            for record in records:
+                del record["move_times"]
+            return records, [wins[test_agent.player], wins[cpu_agent.player]]
+
+        serial = play(None)
+        with multiprocessing.Pool(2) as pool:
+            parallel = play(pool)
+        self.assertEqual(parallel, serial)
+        self.assertEqual(sum(serial[1]), 4)
+
+    def test_mcts_player(self):
+        """The competition agent returns legal moves within its margin and
+        keeps the subtree of the position reached between turns."""
+        import competition_agent
+
+        def countdown(calls):
+            """Return a clock that runs out after `calls` readings."""
+            remaining = [calls + 1.]
+            def time_left():
+                remaining[0] -= 1.
+                return remaining[0]
+            return time_left
+
+        player = competition_agent.CustomPlayer()
+        game = isolation.Board(player, self.player2)
+        game.apply_move((3, 3))
+        game.apply_move((2, 3))
+        move = player.get_move(game, countdown(500))
+        self.assertIn(move, game.get_legal_moves())
+        self.assertEqual(player.playouts, 500)
+        game.apply_move(move)
+        game.apply_move(game.get_legal_moves()[0])
+        move = player.get_move(game, countdown(100))
+        self.assertIn(move, game.get_legal_moves())
+        self.assertGreater(player._visits[0], player.playouts)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,197 @@
+"""This file contains vectorized versions of the heuristic functions in
+`game_agent.py` and `sample_players.py` that score many game states with a
+single NumPy call.
+
+A batch of states is described by a `Leaves` tuple of arrays holding the
+cell index of each player and the open cells of each board, which can be
+built from `isolation.Board` objects with `leaves()`. Every batch score
+function returns an array with one score per state that matches the value
+of the corresponding scalar heuristic, including +/-inf for won and lost
+states.
+
+Example:
+
+    values = custom_score(leaves([game.forecast_move(m) for m in moves], player))
+
+Batches pay off when many states are scored at once, such as the positions
+of a game record corpus (see `benchmark.py --batch` for the break-even batch
+size). They are not used inside the alpha-beta search: the few children of
+a node are scored faster one at a time by the scalar heuristics, which also
+keep the cutoffs between siblings.
+"""
+from collections import namedtuple
+
+import numpy as np
+
+from isolation.isolation import KNIGHT_DIRECTIONS
+
+
+class Leaves(namedtuple("Leaves", ["width", "height", "own", "opp", "blank",
+                                   "own_active"])):
+    """A batch of game states seen from the point of view of one player.
+
+    Attributes
+    ----------
+    width, height : int
+        The dimensions of every board in the batch.
+
+    own, opp : numpy.ndarray of int, shape (n,)
+        The cell index (`row + col * height`) of the player and of its
+        opponent, or `width * height` if that player has not moved yet.
+
+    blank : numpy.ndarray of bool, shape (n, width * height)
+        The open cells of each board.
+
+    own_active : numpy.ndarray of bool, shape (n,)
+        True where the player holds the initiative.
+    """
+    __slots__ = ()
+
+
+_TABLES = {}
+
+
+def _tables(width, height):
+    """Return the (neighbours, rows, cols) arrays for a board size.
+
+    `neighbours[i, j]` is True if a knight can move from cell i to cell j;
+    the extra last row stands for a player that has not moved yet and can
+    reach every cell. `rows` and `cols` give the coordinates of each cell
+    (NaN for the extra index).
+    """
+    key = (width, height)
+    tables = _TABLES.get(key)
+    if tables is None:
+        cells = width * height
+        neighbours = np.zeros((cells + 1, cells), dtype=bool)
+        neighbours[cells] = True
+        rows = np.full(cells + 1, np.nan)
+        cols = np.full(cells + 1, np.nan)
+        for c in range(width):
+            for r in range(height):
+                idx = r + c * height
+                rows[idx], cols[idx] = r, c
+                for dr, dc in KNIGHT_DIRECTIONS:
+                    if 0 <= r + dr < height and 0 <= c + dc < width:
+                        neighbours[idx, r + dr + (c + dc) * height] = True
+        tables = _TABLES[key] = (neighbours, rows, cols)
+    return tables
+
+
+def leaf_state(game, player):
+    """Return the (own, opp, blank, own_active) values of a single board for
+    the given player, for collecting states one at a time during a search.
+    """
+    cells = game.width * game.height
+    idx = game.player_index(player)
+    own = game.get_index_location(idx)
+    opp = game.get_index_location(idx ^ 1)
+    return (cells if own is None else own[0] + own[1] * game.height,
+            cells if opp is None else opp[0] + opp[1] * game.height,
+            game.get_blank_mask(),
+            game.active_index == idx)
+
+
+def to_leaves(width, height, states):
+    """Build a `Leaves` batch from a sequence of `leaf_state()` tuples."""
+    cells = width * height
+    own, opp, masks, own_active = zip(*states)
+    if cells <= 64:
+        # Shift the bits of every mask out in one operation
+        shifts = np.arange(cells, dtype=np.uint64)
+        blank = (np.array(masks, dtype=np.uint64)[:, None] >> shifts) & np.uint64(1)
+    else:
+        nbytes = (cells + 7) // 8
+        raw = np.frombuffer(b"".join(m.to_bytes(nbytes, "little") for m in masks),
+                            dtype=np.uint8).reshape(len(masks), nbytes)
+        blank = np.unpackbits(raw, axis=1, count=cells, bitorder="little")
+    return Leaves(width, height, np.array(own), np.array(opp),
+                  blank.astype(bool), np.array(own_active))
+
+
+def leaves(games, player):
+    """Build a `Leaves` batch from a sequence of boards of the same size."""
+    return to_leaves(games[0].width, games[0].height,
+                     [leaf_state(game, player) for game in games])
+
+
+def _mobility(leaves):
+    """Return the number of legal moves for the player and the opponent."""
+    neighbours, _, _ = _tables(leaves.width, leaves.height)
+    own_moves = (neighbours[leaves.own] & leaves.blank).sum(axis=1)
+    opp_moves = (neighbours[leaves.opp] & leaves.blank).sum(axis=1)
+    return own_moves, opp_moves
+
+
+def _terminal(leaves, own_moves, opp_moves, scores):
+    """Overwrite the scores of won and lost states with +/-inf."""
+    active_moves = np.where(leaves.own_active, own_moves, opp_moves)
+    over = active_moves == 0
+    scores[over & leaves.own_active] = float("-inf")
+    scores[over & ~leaves.own_active] = float("inf")
+    return scores
+
+
+def _positions(leaves):
+    """Return the (row, col) arrays of the player and the opponent."""
+    _, rows, cols = _tables(leaves.width, leaves.height)
+    return rows[leaves.own], cols[leaves.own], rows[leaves.opp], cols[leaves.opp]
+
+
+def null_score(leaves):
+    """Batch version of `sample_players.null_score`."""
+    own_moves, opp_moves = _mobility(leaves)
+    return _terminal(leaves, own_moves, opp_moves, np.zeros(len(leaves.own)))
+
+
+def open_move_score(leaves):
+    """Batch version of `sample_players.open_move_score`."""
+    own_moves, opp_moves = _mobility(leaves)
+    return _terminal(leaves, own_moves, opp_moves, own_moves.astype(float))
+
+
+def improved_score(leaves):
+    """Batch version of `sample_players.improved_score`."""
+    own_moves, opp_moves = _mobility(leaves)
+    return _terminal(leaves, own_moves, opp_moves,
+                     (own_moves - opp_moves).astype(float))
+
+
+def center_score(leaves):
+    """Batch version of `sample_players.center_score`."""
+    own_moves, opp_moves = _mobility(leaves)
+    y, x, _, _ = _positions(leaves)
+    w, h = leaves.width / 2., leaves.height / 2.
+    return _terminal(leaves, own_moves, opp_moves, (h - y)**2 + (w - x)**2)
+
+
+def custom_score(leaves):
+    """Batch version of `game_agent.custom_score`."""
+    own_moves, opp_moves = _mobility(leaves)
+    y, x, opp_y, opp_x = _positions(leaves)
+    center_width, center_height = leaves.width / 2., leaves.height / 2.
+    opp_score = -((opp_y - y)**2 + (opp_x - x)**2)
+    center = -((center_height - y)**2 + (center_width - x)**2)
+    return _terminal(leaves, own_moves, opp_moves,
+                     1.5 * own_moves + 1.75 * center + 0.7 * opp_score)
+
+
+def custom_score_2(leaves):
+    """Batch version of `game_agent.custom_score_2`."""
+    own_moves, opp_moves = _mobility(leaves)
+    y, x, opp_y, opp_x = _positions(leaves)
+    center_width, center_height = leaves.width / 2., leaves.height / 2.
+    oppdist = -((opp_y - y)**2 + (opp_x - x)**2)
+    centdist = -((center_height - y)**2 + (center_width - x)**2)
+    return _terminal(leaves, own_moves, opp_moves, oppdist + 1.75 * centdist)
+
+
+def custom_score_3(leaves):
+    """Batch version of `game_agent.custom_score_3`."""
+    own_moves, opp_moves = _mobility(leaves)
+    y, x, _, _ = _positions(leaves)
+    center_width, center_height = leaves.width / 2., leaves.height / 2.
+    return _terminal(leaves, own_moves, opp_moves,
+                     1.5 * own_moves - (np.abs(center_height - y) +
+                                        np.abs(center_width - x)))
+
@@ -0,0 +1,340 @@
+"""Measure the speed of the isolation engine and the search agents.
+
+The benchmark has two parts:
+
+  - perft: an exhaustive count of the move sequences from a set of canonical
+    positions on 5x5, 7x7 and 9x9 boards, at every depth up to a fixed
+    limit. The counts are checked against known values, so this doubles as
+    a correctness test of move generation and make/unmake.
+
+  - throughput: the number of calls per second of the Board primitives used
+    by the search (`get_legal_moves`, `forecast_move`, `push_move` /
+    `pop_move`), of every heuristic in `game_agent.py` and
+    `sample_players.py`, and the nodes per second of a fixed-depth
+    alpha-beta search.
+
+With --batch, the benchmark also compares the NumPy heuristics of
+`batch_scores.py` with the scalar ones, in states scored per second for
+batches of several sizes (including the children of a single node), which
+shows the batch size from which batching pays off.
+
+With --smp N, the benchmark also searches the sample positions with a
+fixed time limit using 0 to N helper processes (see the `smp_workers`
+parameter of `AlphaBetaPlayer`), and reports the depth reached and the
+speedup in time to depth over the single-process search.
+
+The results are printed as JSON (or written to a file with --output) so
+that runs on different commits can be compared. The script exits with a
+non-zero status if any perft count is wrong.
+"""
+import argparse
+import json
+import platform
+import random
+import subprocess
+import sys
+import timeit
+
+from collections import namedtuple
+
+from isolation import Board
+from sample_players import (null_score, open_move_score, improved_score,
+                            center_score)
+from game_agent import (AlphaBetaPlayer, custom_score, custom_score_2,
+                        custom_score_3)
+
+Position = namedtuple("Position", ["name", "width", "height", "moves", "counts"])
+
+# Perft counts (number of move sequences of each length, starting at one)
+# from canonical positions, computed with the original list-based Board
+PERFT_POSITIONS = [
+    Position("5x5-empty", 5, 5, [],
+             [25, 600, 2208, 7712, 24160]),
+    Position("5x5-corners", 5, 5, [(0, 0), (4, 4)],
+             [2, 4, 20, 92, 208, 428, 1034, 2124, 6616, 16068, 28206, 41500]),
+    Position("5x5-midgame", 5, 5,
+             [(2, 2), (1, 2), (1, 0), (2, 4), (0, 2), (4, 3)],
+             [3, 3, 10, 6, 10, 38, 63, 78, 97, 106, 103, 102, 96, 42]),
+    Position("7x7-empty", 7, 7, [],
+             [49, 2352, 11280, 52672]),
+    Position("7x7-center", 7, 7, [(3, 3), (2, 3)],
+             [8, 64, 308, 1332, 4436, 15740, 56810]),
+    Position("7x7-midgame", 7, 7,
+             [(3, 3), (2, 3), (2, 1), (1, 5), (4, 2), (3, 6), (3, 0), (4, 4),
+              (5, 1), (5, 6), (4, 3), (6, 4)],
+             [6, 12, 46, 153, 415, 1084, 2579, 6841, 17409]),
+    Position("9x9-empty", 9, 9, [],
+             [81, 6480, 35392, 190432]),
+    Position("9x9-center", 9, 9, [(4, 4), (3, 4)],
+             [8, 64, 436, 2764, 12084, 55318]),
+    Position("9x9-midgame", 9, 9,
+             [(4, 4), (3, 4), (3, 2), (2, 6), (4, 0), (4, 5), (2, 1), (2, 4),
+              (3, 3), (1, 6), (5, 2), (0, 8), (6, 4), (2, 7), (7, 2), (0, 6)],
+             [5, 15, 42, 126, 542, 1826, 7242, 25302]),
+]
+
+HEURISTICS = [null_score, open_move_score, improved_score, center_score,
+              custom_score, custom_score_2, custom_score_3]
+
+
+def perft(game, depth):
+    """Return the number of sequences of `depth` legal moves from `game`."""
+    if depth == 0:
+        return 1
+    moves = game.get_legal_moves()
+    if depth == 1:
+        return len(moves)
+    count = 0
+    for move in moves:
+        game.push_move(move)
+        count += perft(game, depth - 1)
+        game.pop_move()
+    return count
+
+
+def make_board(position, player_1="Player1", player_2="Player2"):
+    """Return a board with the moves of a canonical position applied."""
+    game = Board(player_1, player_2, width=position.width, height=position.height)
+    for move in position.moves:
+        game.apply_move(move)
+    return game
+
+
+def run_perft(positions):
+    """Count and time perft to every depth for each position, and check the
+    counts against the expected values.
+    """
+    results = []
+    for position in positions:
+        game = make_board(position)
+        for depth, expected in enumerate(position.counts, 1):
+            start = timeit.default_timer()
+            nodes = perft(game, depth)
+            seconds = timeit.default_timer() - start
+            results.append({
+                "position": position.name, "depth": depth, "nodes": nodes,
+                "expected": expected, "ok": nodes == expected,
+                "seconds": seconds,
+                "nodes_per_second": nodes / seconds if seconds else None})
+    return results
+
+
+def calls_per_second(fn, args_list, min_time):
+    """Call `fn(*args)` for every entry of `args_list`, repeating the sweep
+    until at least `min_time` seconds have passed, and return the rate.
+    """
+    calls = 0
+    start = timeit.default_timer()
+    elapsed = 0.
+    while elapsed < min_time:
+        for args in args_list:
+            fn(*args)
+        calls += len(args_list)
+        elapsed = timeit.default_timer() - start
+    return calls / elapsed
+
+
+def sample_boards(players, count, seed, width=7, height=7):
+    """Return `count` positions between `players` with both players placed,
+    sampled from random games so that every stage of the game is
+    represented.
+    """
+    rng = random.Random(seed)
+    boards = []
+    while len(boards) < count:
+        game = Board(players[0], players[1], width=width, height=height)
+        for move in rng.sample(game.get_blank_spaces(), 2):
+            game.apply_move(move)
+        while len(boards) < count:
+            moves = sorted(game.get_legal_moves())
+            if not moves:
+                break
+            boards.append(game.copy())
+            game.apply_move(rng.choice(moves))
+    return boards
+
+
+def push_pop(game, move):
+    game.push_move(move)
+    game.pop_move()
+
+
+def run_throughput(boards, min_time):
+    """Measure the Board primitives and the heuristics on sample boards."""
+    moves = [(game, game.get_legal_moves()[0]) for game in boards]
+    results = {
+        "get_legal_moves": calls_per_second(
+            Board.get_legal_moves, [(game,) for game in boards], min_time),
+        "forecast_move": calls_per_second(Board.forecast_move, moves, min_time),
+        "push_pop_move": calls_per_second(push_pop, moves, min_time),
+    }
+    for score_fn in HEURISTICS:
+        args = [(game, player) for game in boards
+                for player in (game.active_player, game.inactive_player)]
+        results[score_fn.__name__] = calls_per_second(score_fn, args, min_time)
+    return results
+
+
+def run_search(boards, depth):
+    """Search every board to a fixed depth with alpha-beta, starting from an
+    empty transposition table, and return the total nodes, time and nodes
+    per second.
+    """
+    nodes = 0
+    seconds = 0.
+    for game in boards:
+        player = game.active_player
+        player.tt.clear()
+        player.time_left = lambda: float("inf")
+        start_nodes = player.nodes
+        start = timeit.default_timer()
+        player.alphabeta(game, depth)
+        seconds += timeit.default_timer() - start
+        nodes += player.nodes - start_nodes
+    return {"depth": depth, "positions": len(boards), "nodes": nodes,
+            "seconds": seconds, "nodes_per_second": nodes / seconds}
+
+
+def run_batch(boards, min_time, sizes=(8, 64, 1024)):
+    """Measure the states scored per second by the batch heuristics, building
+    each batch from `Board` objects, against the scalar heuristics on the
+    same states, for batches of each size in `sizes`.
+    """
+    # Imported here so that the other benchmarks do not need NumPy
+    import batch_scores
+
+    pairs = [(improved_score, batch_scores.improved_score),
+             (custom_score, batch_scores.custom_score)]
+    results = []
+    for size in sizes:
+        groups = [boards[i:i + size] for i in range(0, len(boards), size)]
+        groups = [group for group in groups if len(group) == size]
+        if not groups:
+            continue
+
+        def score_batch(batch_fn, group):
+            batch_fn(batch_scores.leaves(group, group[0].active_player))
+
+        def score_each(score_fn, group):
+            for game in group:
+                score_fn(game, group[0].active_player)
+
+        for score_fn, batch_fn in pairs:
+            scalar = size * calls_per_second(
+                score_each, [(score_fn, group) for group in groups], min_time)
+            batch = size * calls_per_second(
+                score_batch, [(batch_fn, group) for group in groups], min_time)
+            results.append({"heuristic": score_fn.__name__, "batch_size": size,
+                            "scalar_states_per_second": scalar,
+                            "batch_states_per_second": batch,
+                            "speedup": batch / scalar})
+    return results
+
+
+def run_parallel(boards, max_workers, time_limit):
+    """Search every board for `time_limit` milliseconds with each number of
+    helper processes from 0 to `max_workers`, and return the mean depth
+    reached and the time to depth relative to the single-process search.
+
+    The time to depth of a position is the time the main search took to
+    complete the deepest iteration that every run completed. The endgame
+    solver is disabled, so that the depths and times of partitioned
+    positions come from iterative deepening like the others.
+    """
+    runs = []
+    for workers in range(max_workers + 1):
+        player = AlphaBetaPlayer(score_fn=improved_score, smp_workers=workers,
+                                 endgame_cells=0)
+        stats = []
+        for game in boards:
+            position = game.with_players(*[
+                player if i == game.active_index else "Opponent" for i in (0, 1)])
+            start = timeit.default_timer()
+            player.get_move(position, lambda: time_limit - 1000 * (
+                timeit.default_timer() - start))
+            stats.append(player.stats)
+        player.close()
+        runs.append(stats)
+
+    depths = [min(run[i].depth for run in runs) for i in range(len(boards))]
+    results = []
+    for workers, run in enumerate(runs):
+        ms = sum(sum(s.iteration_times[:depth]) for s, depth in zip(run, depths))
+        if not workers:
+            base_ms = ms
+        results.append({
+            "workers": workers, "time_limit_ms": time_limit,
+            "mean_depth": sum(s.depth for s in run) / len(run),
+            "mean_helper_depth": sum(s.helper_depth for s in run) / len(run),
+            "time_to_depth_ms": ms,
+            "speedup": base_ms / ms if ms else None})
+    return results
+
+
+def git_revision():
+    """Return the current git commit hash, or None outside a git checkout."""
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "HEAD"], stderr=subprocess.DEVNULL,
+            universal_newlines=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("-o", "--output", metavar="FILE",
+                        help="write the results to FILE instead of stdout")
+    parser.add_argument("--positions", type=int, default=200,
+                        help="number of sample positions for the throughput "
+                             "and search benchmarks (default: 200)")
+    parser.add_argument("--search-depth", type=int, default=4,
+                        help="depth of the fixed-depth search (default: 4)")
+    parser.add_argument("--min-time", type=float, default=0.5,
+                        help="minimum seconds per throughput measurement "
+                             "(default: 0.5)")
+    parser.add_argument("--seed", type=int, default=0,
+                        help="random seed for the sample positions")
+    parser.add_argument("--batch", action="store_true",
+                        help="also compare the NumPy batch heuristics with "
+                             "the scalar ones (requires NumPy)")
+    parser.add_argument("--smp", type=int, default=0, metavar="N",
+                        help="also measure parallel search with up to N "
+                             "helper processes (default: 0)")
+    parser.add_argument("--smp-time", type=float, default=150.,
+                        help="milliseconds per parallel search (default: 150)")
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    players = (AlphaBetaPlayer(score_fn=improved_score),
+               AlphaBetaPlayer(score_fn=improved_score))
+    boards = sample_boards(players, args.positions, args.seed)
+    results = {
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "perft": run_perft(PERFT_POSITIONS),
+        "throughput": run_throughput(boards, args.min_time),
+        "search": run_search(boards, args.search_depth),
+    }
+    if args.batch:
+        results["batch"] = run_batch(boards, args.min_time)
+    if args.smp:
+        results["parallel"] = run_parallel(boards, args.smp, args.smp_time)
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+    failed = [r for r in results["perft"] if not r["ok"]]
+    for r in failed:
+        print("perft mismatch: {position} depth {depth}: {nodes} != {expected}"
+              .format(**r), file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,6 +4,7 @@ champions) in a tournament.
 
          COMPLETING AND SUBMITTING A COMPETITION AGENT IS OPTIONAL
 """
+import math
 import random
 
 
@@ -18,6 +19,11 @@ def custom_score(game, player):
 
     This should be the best heuristic function for your project submission.
 
+    The Monte Carlo player below estimates positions by random playouts
+    instead, so this is only a cheap mobility estimate: the difference
+    between the number of moves available to each player, with the
+    opponent's moves weighted double, and +/-inf for won and lost games.
+
     Parameters
     ----------
     game : `isolation.Board`
@@ -33,7 +39,44 @@ def custom_score(game, player):
     float
         The heuristic value of the current game state to the specified player.
     """
-    raise NotImplementedError
+    utility, own_moves, opp_moves = game.get_mobility(player)
+    if utility:
+        return utility
+    return float(own_moves - 2 * opp_moves)
+
+
+_NEIGHBOURS = {}
+
+
+def _neighbours(game):
+    """Return, for each cell index of the board, the tuple of cell indices a
+    knight can move to from that cell, shared by every board of that size.
+    """
+    key = (game.width, game.height)
+    neighbours = _NEIGHBOURS.get(key)
+    if neighbours is None:
+        neighbours = []
+        for mask in game.get_knight_masks():
+            cells = []
+            while mask:
+                low = mask & -mask
+                cells.append(low.bit_length() - 1)
+                mask ^= low
+            neighbours.append(tuple(cells))
+        neighbours = _NEIGHBOURS[key] = tuple(neighbours)
+    return neighbours
+
+
+def _board_state(game):
+    """Return the (blank, loc_1, loc_2, active) state of a board, where the
+    locations are cell indices (`row + col * height`, or -1 if the player
+    has not moved) and `blank` is the bitmask of open cells.
+    """
+    locs = []
+    for idx in (0, 1):
+        loc = game.get_index_location(idx)
+        locs.append(-1 if loc is None else loc[0] + loc[1] * game.height)
+    return game.get_blank_mask(), locs[0], locs[1], game.active_index
 
 
 class CustomPlayer:
@@ -49,6 +92,22 @@ class CustomPlayer:
         COMPETITION.  IT IS NOT REQUIRED FOR THE ISOLATION PROJECT REVIEW.
     **************************************************************************
 
+    This player uses Monte Carlo tree search with the UCT selection rule.
+    Game states inside the search are plain integers (an open-cell bitmask,
+    the two player cells and the side to move), so playouts never touch a
+    `Board`. The tree is stored in parallel lists indexed by node number,
+    with the children of each node in one contiguous block:
+
+        move[i]         cell index of the move that leads to node i
+        first_child[i]  index of the first child, or -1 if not expanded
+        num_children[i] number of children
+        visits[i]       number of playouts through node i
+        wins[i]         playouts won by the player who made move[i]
+
+    After each move the subtree of the position reached is copied to the
+    front of fresh lists and kept, so the next call to `get_move()` continues
+    from the statistics gathered for the actual opponent reply.
+
     Parameters
     ----------
     data : string
@@ -59,12 +118,35 @@ class CustomPlayer:
         the PvP competition uses more accurate timers that are not cross-
         platform compatible, so a limit of 1ms (vs 10ms for the other classes)
         is generally sufficient.
+
+    exploration : float (optional)
+        The UCT exploration constant; larger values spread the playouts over
+        more moves.
+
+    max_nodes : int (optional)
+        Stop growing the tree (but keep running playouts) once it has this
+        many nodes.
     """
 
-    def __init__(self, data=None, timeout=1.):
+    def __init__(self, data=None, timeout=1., exploration=math.sqrt(2),
+                 max_nodes=1 << 20):
         self.score = custom_score
         self.time_left = None
         self.TIMER_THRESHOLD = timeout
+        self.exploration = exploration
+        self.max_nodes = max_nodes
+        self.playouts = 0
+        self._root_state = None
+        self._new_tree()
+
+    def _new_tree(self, move=-1, first_child=-1, num_children=0, visits=0,
+                  wins=0):
+        """Reset the node store to a single root node."""
+        self._move = [move]
+        self._first_child = [first_child]
+        self._num_children = [num_children]
+        self._visits = [visits]
+        self._wins = [wins]
 
     def get_move(self, game, time_left):
         """Search for the best move from the available legal moves and return a
@@ -93,5 +175,197 @@ class CustomPlayer:
             Board coordinates corresponding to a legal move; may return
             (-1, -1) if there are no available legal moves.
         """
-        # OPTIONAL: Finish this function!
-        raise NotImplementedError
+        self.time_left = time_left
+        self.playouts = 0
+        legal_moves = game.get_legal_moves()
+        if not legal_moves:
+            return (-1, -1)
+
+        self._neighbours = _neighbours(game)
+        self._masks = game.get_knight_masks()
+        self._path = [0] * (game.width * game.height + 1)
+        self._reuse_tree(_board_state(game))
+
+        try:
+            while True:
+                if self.time_left() < self.TIMER_THRESHOLD:
+                    raise SearchTimeout()
+                self._search()
+        except SearchTimeout:
+            pass
+
+        # Play the most visited move (or any legal move if no playout ran)
+        first = self._first_child[0]
+        if first < 0:
+            return legal_moves[0]
+        best = max(range(first, first + self._num_children[0]),
+                   key=self._visits.__getitem__)
+        cell = self._move[best]
+        return (cell % game.height, cell // game.height)
+
+    def _children_states(self, node, state):
+        """Yield the (child index, child state) pairs of an expanded node."""
+        blank, loc_1, loc_2, active = state
+        first = self._first_child[node]
+        for child in range(first, first + self._num_children[node]):
+            cell = self._move[child]
+            if active:
+                yield child, (blank & ~(1 << cell), loc_1, cell, 0)
+            else:
+                yield child, (blank & ~(1 << cell), cell, loc_2, 1)
+
+    def _reuse_tree(self, state):
+        """Re-root the tree at the node for `state` if it is the current root
+        or one of the positions up to two plies below it, and otherwise start
+        a new tree.
+        """
+        root = None
+        if self._root_state is not None:
+            if state == self._root_state:
+                root = 0
+            else:
+                for child, child_state in self._children_states(0, self._root_state):
+                    if child_state == state:
+                        root = child
+                        break
+                    for grandchild, grandchild_state in self._children_states(
+                            child, child_state):
+                        if grandchild_state == state:
+                            root = grandchild
+                            break
+                    if root is not None:
+                        break
+        self._root_state = state
+        if root is None:
+            self._new_tree()
+        elif root:
+            self._compact(root)
+
+    def _compact(self, root):
+        """Replace the node store by a copy of the subtree under `root`,
+        keeping the children of each node contiguous.
+        """
+        move, first_child, num_children = self._move, self._first_child, self._num_children
+        visits, wins = self._visits, self._wins
+        self._new_tree(-1, -1, 0, visits[root], wins[root])
+        new_first, new_count = self._first_child, self._num_children
+        queue = [(root, 0)]
+        for old, new in queue:
+            first = first_child[old]
+            if first < 0:
+                continue
+            count = num_children[old]
+            new_first[new] = len(self._move)
+            new_count[new] = count
+            for child in range(first, first + count):
+                queue.append((child, len(self._move)))
+                self._move.append(move[child])
+                new_first.append(-1)
+                new_count.append(0)
+                self._visits.append(visits[child])
+                self._wins.append(wins[child])
+
+    def _expand(self, node, blank, loc):
+        """Add a child to `node` for every move of a player at cell `loc`."""
+        mask = self._masks[loc] & blank if loc >= 0 else blank
+        self._first_child[node] = len(self._move)
+        while mask:
+            low = mask & -mask
+            mask ^= low
+            self._move.append(low.bit_length() - 1)
+            self._first_child.append(-1)
+            self._num_children.append(0)
+            self._visits.append(0)
+            self._wins.append(0)
+        self._num_children[node] = len(self._move) - self._first_child[node]
+
+    def _search(self):
+        """Run one iteration of MCTS: select a path down the tree with UCT,
+        expand the leaf, finish the game with a random playout, and update
+        the statistics along the path.
+        """
+        move, first_child, num_children = self._move, self._first_child, self._num_children
+        visits, wins = self._visits, self._wins
+        blank, loc_1, loc_2, active = self._root_state
+        root_active = active
+
+        # The path is written into a preallocated list: an iteration that
+        # allocates no containers never triggers a garbage collection pass,
+        # which would stall for milliseconds on a large heap
+        path = self._path
+        depth = 0
+        node = 0
+
+        # Selection: descend through expanded nodes by the UCT rule
+        while True:
+            if first_child[node] < 0:
+                if not visits[node] or len(move) >= self.max_nodes:
+                    break
+                self._expand(node, blank, loc_2 if active else loc_1)
+            if not num_children[node]:
+                break
+            first = first_child[node]
+            log_visits = math.log(visits[node] or 1)
+            best, best_value = first, -1.
+            for child in range(first, first + num_children[node]):
+                n = visits[child]
+                if not n:
+                    best = child
+                    break
+                value = wins[child] / n + self.exploration * math.sqrt(log_visits / n)
+                if value > best_value:
+                    best, best_value = child, value
+            node = best
+            depth += 1
+            path[depth] = node
+            cell = move[node]
+            blank &= ~(1 << cell)
+            if active:
+                loc_2 = cell
+            else:
+                loc_1 = cell
+            active ^= 1
+
+        winner = self._playout(blank, loc_1, loc_2, active)
+        self.playouts += 1
+
+        # Backpropagation: the player who moved into the node at ply d is the
+        # root player for odd d and the opponent for even d
+        visits[0] += 1
+        for ply in range(1, depth + 1):
+            node = path[ply]
+            visits[node] += 1
+            if winner == root_active ^ ((ply - 1) & 1):
+                wins[node] += 1
+
+    def _playout(self, blank, loc_1, loc_2, active):
+        """Play uniformly random moves from the given state until the game
+        ends, and return the index of the winner (0 or 1).
+        """
+        neighbours = self._neighbours
+        rand = random.random
+        while True:
+            loc = loc_2 if active else loc_1
+            if loc < 0:
+                # A player that has not moved may take any open cell
+                cells = range(len(neighbours))
+            else:
+                cells = neighbours[loc]
+            count = 0
+            for cell in cells:
+                if (blank >> cell) & 1:
+                    count += 1
+            if not count:
+                return active ^ 1
+            pick = int(rand() * count)
+            for cell in cells:
+                if (blank >> cell) & 1:
+                    if not pick:
+                        break
+                    pick -= 1
+            blank &= ~(1 << cell)
+            if active:
+                loc_2 = cell
+            else:
+                loc_1 = cell
+            active ^= 1
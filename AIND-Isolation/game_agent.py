@@ -5,12 +5,316 @@ and include the results in your report.
 import random
 import math
 
+from collections import namedtuple
+
+from isolation.isolation import position_tables
+
 
 class SearchTimeout(Exception):
     """Subclass base exception for code clarity. """
     pass
 
 
+# Bound types for transposition table entries
+EXACT, LOWER, UPPER = 0, 1, 2
+
+
+class TranspositionTable(object):
+    """Fixed-size cache of search results keyed by `Board.hash()`.
+
+    Each slot holds two entries: a depth-preferred entry that is only
+    replaced by a search at least as deep (or of the same position), and an
+    always-replace entry that takes everything else. Entries are tuples of
+    (key, depth, value, bound, move), where depth is the number of plies that
+    were searched below the position and bound is one of EXACT, LOWER or
+    UPPER.
+
+    Parameters
+    ----------
+    max_entries : int (optional)
+        Upper bound on the number of stored entries; rounded down to a power
+        of two so that slots can be selected by masking the hash.
+    """
+    def __init__(self, max_entries=1 << 16):
+        slots = 1
+        while slots * 4 <= max_entries:
+            slots *= 2
+        self.max_entries = 2 * slots
+        self._mask = slots - 1
+        self._deep = [None] * slots
+        self._recent = [None] * slots
+        self.probes = 0
+        self.hits = 0
+
+    def clear(self):
+        """Drop every entry and reset the counters."""
+        slots = self._mask + 1
+        self._deep = [None] * slots
+        self._recent = [None] * slots
+        self.probes = 0
+        self.hits = 0
+
+    def probe(self, key):
+        """Return the stored entry for `key`, or None if there is none."""
+        self.probes += 1
+        idx = key & self._mask
+        entry = self._deep[idx]
+        if entry is None or entry[0] != key:
+            entry = self._recent[idx]
+            if entry is None or entry[0] != key:
+                return None
+        self.hits += 1
+        return entry
+
+    def store(self, key, depth, value, bound, move):
+        """Record the result of searching position `key` to `depth` plies."""
+        idx = key & self._mask
+        entry = (key, depth, value, bound, move)
+        deep = self._deep[idx]
+        if deep is None or deep[0] == key or deep[1] <= depth:
+            self._deep[idx] = entry
+        else:
+            self._recent[idx] = entry
+
+
+class SharedTranspositionTable(object):
+    """`TranspositionTable` held in shared memory, so that the helper
+    processes of a parallel `AlphaBetaPlayer` search share their results.
+
+    Entries are stored without locks as three machine words: the packed
+    depth, bound and move, the value, and a check word that XORs the key
+    with the other two. A reader only accepts an entry whose words agree
+    with the key, so an entry torn by a concurrent write simply misses.
+    Depths and move coordinates are packed into one byte each, which covers
+    every board up to 15x15. The `probes` and `hits` counters are local to
+    each process.
+
+    Parameters
+    ----------
+    max_entries : int (optional)
+        Upper bound on the number of stored entries; rounded down to a power
+        of two so that slots can be selected by masking the hash.
+    """
+    def __init__(self, max_entries=1 << 16):
+        # Imported here so that agents that search in a single process never
+        # need shared memory
+        import multiprocessing
+        slots = 1
+        while slots * 4 <= max_entries:
+            slots *= 2
+        self.max_entries = 2 * slots
+        self._mask = slots - 1
+        # Slot idx holds its depth-preferred entry at 2 * idx and its
+        # always-replace entry at 2 * idx + 1
+        self._check = multiprocessing.RawArray("Q", 2 * slots)
+        self._data = multiprocessing.RawArray("Q", 2 * slots)
+        self._value = multiprocessing.RawArray("d", 2 * slots)
+        self.probes = 0
+        self.hits = 0
+
+    def clear(self):
+        """Drop every entry and reset the counters. No other process may use
+        the table meanwhile.
+        """
+        import ctypes
+        ctypes.memset(self._data, 0, ctypes.sizeof(self._data))
+        self.probes = 0
+        self.hits = 0
+
+    def _key(self, i):
+        """Return the key of entry `i`, or None if it is empty."""
+        data = self._data[i]
+        if not data:
+            return None
+        return self._check[i] ^ data ^ (hash(self._value[i]) & 0xFFFFFFFFFFFFFFFF)
+
+    def probe(self, key):
+        """Return the stored entry for `key`, or None if there is none."""
+        self.probes += 1
+        idx = 2 * (key & self._mask)
+        for i in (idx, idx + 1):
+            data = self._data[i]
+            value = self._value[i]
+            if data and (self._check[i] ^ data ^
+                         (hash(value) & 0xFFFFFFFFFFFFFFFF)) == key:
+                self.hits += 1
+                row, col = (data >> 10) & 0xFF, (data >> 18) & 0xFF
+                move = (row - 1, col - 1) if row else None
+                return (key, data & 0xFF, value, (data >> 8) & 3, move)
+        return None
+
+    def store(self, key, depth, value, bound, move):
+        """Record the result of searching position `key` to `depth` plies."""
+        idx = 2 * (key & self._mask)
+        data = 1 << 26 | depth | bound << 8
+        if move is not None:
+            data |= (move[0] + 1) << 10 | (move[1] + 1) << 18
+        i = idx
+        deep_key = self._key(idx)
+        if (deep_key is not None and deep_key != key and
+                self._data[idx] & 0xFF > depth):
+            i = idx + 1
+        self._data[i] = data
+        self._value[i] = value
+        self._check[i] = key ^ data ^ (hash(value) & 0xFFFFFFFFFFFFFFFF)
+
+
+class SearchStats(namedtuple("SearchStats", [
+        "move_count", "depth", "nodes", "leaves", "cutoffs", "ebf",
+        "iteration_times", "tt_probes", "tt_hits", "tt_hit_rate",
+        "first_move_cutoff_rate", "time_ms", "endgame", "ponder_depth",
+        "pvs_researches", "fail_lows", "fail_highs", "helper_depth"])):
+    """Statistics describing the search for a single move.
+
+    Attributes
+    ----------
+    move_count : int
+        The `move_count` of the board that was searched.
+
+    depth : int
+        The depth of the deepest completed iteration (0 if none completed).
+
+    nodes, leaves, cutoffs : int
+        Search nodes visited, leaf states scored, and alpha/beta cutoffs
+        over all iterations (including the unfinished one).
+
+    ebf : float
+        Effective branching factor: the ratio between the node counts of the
+        last two completed iterations, or nodes ** (1 / depth) if only one
+        iteration completed.
+
+    iteration_times : list<float>
+        Milliseconds spent on each completed iteration.
+
+    tt_probes, tt_hits : int
+        Transposition table lookups and hits during the search.
+
+    tt_hit_rate, first_move_cutoff_rate : float
+        Fraction of lookups that hit, and of cutoffs caused by the first
+        move tried at a node.
+
+    time_ms : float
+        Milliseconds spent in `get_move()`.
+
+    endgame : bool
+        True if the move was chosen by the exact endgame solver, in which
+        case `depth` is the length of the longest path it found.
+
+    ponder_depth : int
+        The depth completed by pondering on the opponent's time before this
+        move (0 if the player does not ponder).
+
+    pvs_researches : int
+        Null-window searches of principal variation search that failed high
+        and had to be repeated with the full window.
+
+    fail_lows, fail_highs : int
+        Root searches that fell below or above their aspiration window and
+        were repeated with the window opened on that side.
+
+    helper_depth : int
+        The deepest iteration completed by the helper processes of a
+        parallel search (0 without helpers). When it is deeper than `depth`,
+        the helper's move was played.
+    """
+    __slots__ = ()
+
+
+class MoveOrderer(object):
+    """Order moves for alpha-beta search so that likely cutoffs come first.
+
+    Moves are tried in the order: the principal-variation move (usually the
+    best move stored in the transposition table by the previous iteration),
+    then the killer moves that caused cutoffs at the same ply, then the
+    remaining moves ranked by the history heuristic. The history table is
+    kept separately for the maximizing and minimizing sides.
+
+    Parameters
+    ----------
+    num_killers : int (optional)
+        The number of killer moves remembered for each ply.
+    """
+    def __init__(self, num_killers=2):
+        self.num_killers = num_killers
+        self._killers = []
+        self._history = ({}, {})
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0
+
+    @property
+    def first_move_cutoff_rate(self):
+        """The fraction of cutoffs in the current search that were caused by
+        the first move tried (1.0 for perfect ordering).
+        """
+        return self.first_move_cutoffs / self.cutoffs if self.cutoffs else 0.
+
+    def clear(self):
+        """Forget the killer moves and the history scores."""
+        self._killers = []
+        self._history = ({}, {})
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0
+
+    def new_search(self):
+        """Reset the per-search state before searching a new root position.
+
+        Killer moves are indexed by ply from the root, so they are discarded;
+        history scores are halved so that recent cutoffs dominate.
+        """
+        self._killers = []
+        for history in self._history:
+            for move in history:
+                history[move] //= 2
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0
+
+    def order(self, moves, ply, side, pv_move=None):
+        """Sort a list of moves in place, best candidates first.
+
+        Parameters
+        ----------
+        moves : list<(int, int)>
+            The legal moves at the current node.
+
+        ply : int
+            The distance of the node from the root of the search.
+
+        side : int
+            0 for nodes where the searching player moves, 1 for the opponent.
+
+        pv_move : (int, int) or None (optional)
+            The move to try first, e.g. the best move from a previous search.
+        """
+        history = self._history[side]
+        moves.sort(key=lambda m: history.get(m, 0), reverse=True)
+        if ply < len(self._killers):
+            for killer in reversed(self._killers[ply]):
+                if killer in moves:
+                    moves.remove(killer)
+                    moves.insert(0, killer)
+        if pv_move is not None and pv_move in moves:
+            moves.remove(pv_move)
+            moves.insert(0, pv_move)
+        return moves
+
+    def record_cutoff(self, move, ply, side, depth, index):
+        """Update the killer and history tables after `move`, the `index`-th
+        move tried at a node `depth` plies above the horizon, caused a cutoff.
+        """
+        self.cutoffs += 1
+        if index == 0:
+            self.first_move_cutoffs += 1
+        while len(self._killers) <= ply:
+            self._killers.append([])
+        killers = self._killers[ply]
+        if move in killers:
+            killers.remove(move)
+        killers.insert(0, move)
+        del killers[self.num_killers:]
+        history = self._history[side]
+        history[move] = history.get(move, 0) + depth * depth
+
+
 def custom_score(game, player):
     """Calculate the heuristic value of a game state from the point of view
     of the given player.
@@ -44,33 +348,23 @@ def custom_score(game, player):
     # you in - stay close enough to your opponent that he can't box you out.
     # While doing this, prefer moves with more open possibilities.
     
-    # Check win/loss conditions
-    if game.is_loser(player):
-        return float("-inf")
-
-    if game.is_winner(player):
-        return float("inf")
-
-    # Find the center of the board
-    center_width = game.width/2.0
-    center_height = game.height/2.0
-    
-    # Find the player's position
-    player_height, player_width = game.get_player_location(player)
-    
-    # Find the opponent's position
-    opp_height, opp_width = game.get_player_location(game.get_opponent(player))
+    # Check win/loss conditions, and count the open moves
+    utility, move_score, _ = game.get_mobility(player)
+    if utility:
+        return utility
+
+    # Look up the distances for the cells of the player and the opponent
+    tables = position_tables(game.width, game.height)
+    idx = game.player_index(player)
+    own_cell, opp_cell = game.get_index_cell(idx), game.get_index_cell(idx ^ 1)
     
     # Find the NEGATIVE Square Euclidean distance to the other player, as we want
     # to prefer positions closer to our opponents
-    opp_score = -((opp_height - player_height)**2 + (opp_width - player_width)**2)
+    opp_score = -tables.pair_sq[own_cell * tables.cells + opp_cell]
     
     # Find the NEGATIVE Square Euclidean Distance to the center of the board, 
     # as we want to prefer positions closer to center
-    center_score = -((center_height - player_height)**2 + (center_width - player_width)**2)
-    
-    # Find the number of open moves
-    move_score = len(game.get_legal_moves(player))
+    center_score = -tables.center_sq[own_cell]
     
     # Combined
     
@@ -105,29 +399,22 @@ def custom_score_2(game, player):
     # but prefer moves that are farther from the corners to avoid traps
     
     # Check win/loss conditions
-    if game.is_loser(player):
-        return float("-inf")
-
-    if game.is_winner(player):
-        return float("inf")
-
-    # Find the center of the board
-    center_width = game.width/2.0
-    center_height = game.height/2.0
-    
-    # Find the player's position
-    player_height, player_width = game.get_player_location(player)
-    
-    # Find the opponent's position
-    opp_height, opp_width = game.get_player_location(game.get_opponent(player))
+    utility = game.utility(player)
+    if utility:
+        return utility
+
+    # Look up the distances for the cells of the player and the opponent
+    tables = position_tables(game.width, game.height)
+    idx = game.player_index(player)
+    own_cell, opp_cell = game.get_index_cell(idx), game.get_index_cell(idx ^ 1)
     
     # Find the NEGATIVE Square Euclidean distance to the other player, as we want
     # to prefer positions closer to our opponents
-    oppdist = -((opp_height - player_height)**2 + (opp_width - player_width)**2)
+    oppdist = -tables.pair_sq[own_cell * tables.cells + opp_cell]
     
     # Find the NEGATIVE Square Euclidean Distance to the center of the board, 
     # as we want to prefer positions closer to center
-    centdist = -((center_height - player_height)**2 + (center_width - player_width)**2)
+    centdist = -tables.center_sq[own_cell]
     
     # Prefer center positions more
     return float(oppdist + 1.75*centdist)
@@ -161,26 +448,68 @@ def custom_score_3(game, player):
     # & the center of the board, while still preferring moves that keep 
     # open the most possible child moves
     
-    # Check win/loss conditions
-    if game.is_loser(player):
-        return float("-inf")
-
-    if game.is_winner(player):
-        return float("inf")
-    
-    # Find the center of the board
-    center_width, center_height = game.width/2.0, game.height/2.0
-    
-    # Find the player's position
-    player_height, player_width = game.get_player_location(player)
+    # Check win/loss conditions, and get the number of open moves
+    utility, moves, _ = game.get_mobility(player)
+    if utility:
+        return utility
     
-    # Get the number of open moves
-    moves = len(game.get_legal_moves(player))
+    # Look up the distance from the player's cell to the center of the board
+    tables = position_tables(game.width, game.height)
+    own_cell = game.get_index_cell(game.player_index(player))
     
-    # Return the # of number of moves minus the Square Euclidean Distance to 
+    # Return the # of number of moves minus the Manhattan Distance to 
     # the center of the board, as we want to prefer positions closer to center 
     # but also prefer ones that leave open more moves
-    return float(1.5*moves - ((abs(center_height - player_height)) + abs((center_width - player_width))))
+    return float(1.5*moves - tables.center_abs[own_cell])
+
+
+class WeightedScore(object):
+    """Heuristic that scores a state as a weighted sum of features, for
+    tuning the weights of the heuristics above (see `tune.py`).
+
+    The features are the number of legal moves of the player and of its
+    opponent, and the positional terms of
+    `isolation.isolation.PositionTables` for the player's cell: its squared
+    and Manhattan distance to the center, and its squared distance to the
+    opponent. For example, `custom_score` is
+    `WeightedScore(own_moves=1.5, center_sq=-1.75, pair_sq=-0.7)`. Won and
+    lost states score +/-inf.
+
+    Unlike a closure, an instance can be pickled, e.g., to pass players to
+    a process pool.
+
+    Parameters
+    ----------
+    **weights : float
+        The weight of each feature named in `FEATURES`; missing features
+        have a weight of zero.
+    """
+    FEATURES = ("own_moves", "opp_moves", "center_sq", "center_abs", "pair_sq")
+
+    def __init__(self, **weights):
+        unknown = set(weights).difference(self.FEATURES)
+        if unknown:
+            raise ValueError("Unknown features: {}".format(", ".join(sorted(unknown))))
+        self.weights = tuple(float(weights.get(name, 0.)) for name in self.FEATURES)
+
+    def __repr__(self):
+        return "WeightedScore({})".format(", ".join(
+            "{}={!r}".format(name, weight)
+            for name, weight in zip(self.FEATURES, self.weights) if weight))
+
+    def __call__(self, game, player):
+        utility, own_moves, opp_moves = game.get_mobility(player)
+        if utility:
+            return utility
+
+        tables = position_tables(game.width, game.height)
+        idx = game.player_index(player)
+        own_cell, opp_cell = game.get_index_cell(idx), game.get_index_cell(idx ^ 1)
+        own_weight, opp_weight, center_sq, center_abs, pair_sq = self.weights
+        return (own_weight * own_moves + opp_weight * opp_moves +
+                center_sq * tables.center_sq[own_cell] +
+                center_abs * tables.center_abs[own_cell] +
+                pair_sq * tables.pair_sq[own_cell * tables.cells + opp_cell])
 
 
 class IsolationPlayer:
@@ -212,7 +541,120 @@ class IsolationPlayer:
         self.TIMER_THRESHOLD = timeout
 
 
-class MinimaxPlayer(IsolationPlayer):
+def _popcount(mask):
+    """Return the number of set bits in an integer bitmask."""
+    return bin(mask).count("1")
+
+
+def _reachable(neighbours, loc, cells):
+    """Return the bitmask of the cells in `cells` that a knight at cell index
+    `loc` can reach by moves through `cells` (see `Board.get_region_mask`).
+    """
+    region = frontier = neighbours[loc] & cells
+    while frontier:
+        reached = 0
+        while frontier:
+            low = frontier & -frontier
+            reached |= neighbours[low.bit_length() - 1]
+            frontier ^= low
+        frontier = reached & cells & ~region
+        region |= frontier
+    return region
+
+
+def _path_bound(light, loc, cells):
+    """Return an upper bound on the length of a knight's path from cell index
+    `loc` through `cells`, where `light` is the bitmask of the light squares.
+
+    A knight alternates between light and dark squares, so the path can use
+    at most one more square of the colour opposite to `loc` than of its own.
+    """
+    opposite = _popcount(cells & (~light if (light >> loc) & 1 else light))
+    same = _popcount(cells) - opposite
+    return 2 * min(opposite, same) + (opposite > same)
+
+
+class SearchPlayer(IsolationPlayer):
+    """Base class for the search agents that replaces the clock check at every
+    node with a cheap node counter.
+
+    Each search node increments `self.nodes`, and the clock is only read
+    once the count reaches a checkpoint. The distance between checkpoints
+    adapts to the measured node rate so that the clock is read roughly four
+    times per `TIMER_THRESHOLD` milliseconds (and more often as the deadline
+    approaches), which keeps the time-out margin while avoiding a timer call
+    at every node.
+
+    Parameters
+    ----------
+    node_limit : int (optional)
+        If given, abort the search with SearchTimeout once it has visited
+        more than this many nodes in one call to `get_move()`. Combined with
+        a generous time limit this gives deterministic, machine-independent
+        searches for benchmarking.
+
+    book : object (optional)
+        An opening book such as `isolation.book.OpeningBook`, whose
+        `get_move(game)` method returns a precomputed move or None. Moves
+        found in the book are played without searching.
+    """
+    def __init__(self, search_depth=3, score_fn=custom_score, timeout=10.,
+                 node_limit=None, book=None):
+        super().__init__(search_depth, score_fn, timeout)
+        self.node_limit = node_limit
+        self.book = book
+        self.nodes = 0
+        self._next_check = 0
+        self._interval = 1
+        self._clock = None
+
+    def _start_clock(self, time_left):
+        """Reset the node count and the clock schedule for a new move."""
+        self.time_left = time_left
+        self.nodes = 0
+        self._reset_clock()
+
+    def _book_move(self, game):
+        """Return the opening book move for `game`, or None if there is no
+        book or the position is not in it.
+        """
+        if self.book is None:
+            return None
+        return self.book.get_move(game)
+
+    def _reset_clock(self):
+        """Read the clock again at the next node."""
+        self._next_check = self.nodes
+        self._interval = 1
+        self._clock = None
+
+    def _check_clock(self):
+        """Raise SearchTimeout if the time or node budget is exhausted, and
+        otherwise schedule the next clock check.
+        """
+        if self.node_limit is not None and self.nodes > self.node_limit:
+            raise SearchTimeout()
+        remaining = self.time_left()
+        if remaining < self.TIMER_THRESHOLD:
+            raise SearchTimeout()
+
+        # Grow the interval at most twofold per check, and shrink it to the
+        # number of nodes expected in a quarter of the remaining safety margin
+        interval = 2 * self._interval
+        if self._clock is not None:
+            last_nodes, last_remaining = self._clock
+            elapsed = last_remaining - remaining
+            if elapsed > 0:
+                period = min(self.TIMER_THRESHOLD, remaining - self.TIMER_THRESHOLD) / 4.
+                interval = min(interval, int((self.nodes - last_nodes) * period / elapsed))
+        self._interval = max(1, interval)
+        self._clock = (self.nodes, remaining)
+        self._next_check = self.nodes + self._interval
+        if self.node_limit is not None:
+            self._next_check = min(self._next_check, self.node_limit + 1)
+
+
+class MinimaxPlayer(SearchPlayer):
     """Game-playing agent that chooses a move using depth-limited minimax
     search. You must finish and test this player to make sure it properly uses
     minimax to return a good move before the search time limit expires.
@@ -246,7 +688,12 @@ class MinimaxPlayer(IsolationPlayer):
             Board coordinates corresponding to a legal move; may return
             (-1, -1) if there are no available legal moves.
         """
-        self.time_left = time_left
+        self._start_clock(time_left)
+
+        # Play instantly if the position is in the opening book
+        book_move = self._book_move(game)
+        if book_move is not None:
+            return book_move
 
         # Initialize the best move so that this function returns something
         # in case the search fails due to timeout
@@ -302,8 +749,10 @@ class MinimaxPlayer(IsolationPlayer):
                 each helper function or else your agent will timeout during
                 testing.
         """
-        if self.time_left() < self.TIMER_THRESHOLD:
-            raise SearchTimeout()
+        self._reset_clock()
+        self.nodes += 1
+        if self.nodes >= self._next_check:
+            self._check_clock()
 
         # Get the current player's legal moves
         legal_moves = game.get_legal_moves()
@@ -312,16 +761,27 @@ class MinimaxPlayer(IsolationPlayer):
         if not legal_moves:
             return (-1, -1)
         
+        # Search a private copy with push_move/pop_move so a timeout can
+        # abandon it halfway through a move without corrupting the caller's board
+        game = game.copy()
+        
         """
         Begin the minimax calculation by calling min_value as the max player
         Note the "1" while calling min_value
         Note best_move is intialized OOB by the constructor to (-1, -1)
         We pass this because from the root, this is the first level searched
         """
-        # Discard the util value & keep the move part of the tuple
-        _, move = max([(self.min_value(game.forecast_move(m), 1), m) for m in legal_moves])
+        best_util, best_move = float("-inf"), legal_moves[0]
+        for m in legal_moves:
+            game.push_move(m)
+            util = self.min_value(game, 1)
+            game.pop_move()
+            
+            # Keep the move part of the best (util, move) pair
+            if (util, m) > (best_util, best_move):
+                best_util, best_move = util, m
 
-        return move
+        return best_move
     
     
     def max_value(self, game, curr_depth):
@@ -331,9 +791,10 @@ class MinimaxPlayer(IsolationPlayer):
         
         Assumes the opponent is rational & playing to MINIMIZE utility
         """
-        # To avoid timing out
-        if self.time_left() < self.TIMER_THRESHOLD:
-            raise SearchTimeout()
+        # To avoid timing out, count the node and check the clock when due
+        self.nodes += 1
+        if self.nodes >= self._next_check:
+            self._check_clock()
                         
         # Get the legal moves for the current player
         legal_moves = game.get_legal_moves()
@@ -350,9 +811,10 @@ class MinimaxPlayer(IsolationPlayer):
             
             # Find the move that returns the MAX utility AFTER 
             # the opponent has moved. Increase the depth as we move down
-            util = max(util, 
-                       max([self.min_value(game.forecast_move(m), curr_depth+1) for m in legal_moves])
-                       )
+            for m in legal_moves:
+                game.push_move(m)
+                util = max(util, self.min_value(game, curr_depth+1))
+                game.pop_move()
         
         return util
             
@@ -364,9 +826,10 @@ class MinimaxPlayer(IsolationPlayer):
         
         Assumes the opponent is rational & playing to MAXIMIZE utility
         """
-        # To avoid timing out
-        if self.time_left() < self.TIMER_THRESHOLD:
-            raise SearchTimeout()
+        # To avoid timing out, count the node and check the clock when due
+        self.nodes += 1
+        if self.nodes >= self._next_check:
+            self._check_clock()
             
         # Get the legal moves for the current player
         legal_moves = game.get_legal_moves()
@@ -383,18 +846,145 @@ class MinimaxPlayer(IsolationPlayer):
             
             # Find the move that returns the MIN utility AFTER 
             # the opponent has moved. Increase the depth as we move down
-            util = min(util, 
-                       min([self.max_value(game.forecast_move(m), curr_depth+1) for m in legal_moves])
-                       )
+            for m in legal_moves:
+                game.push_move(m)
+                util = min(util, self.max_value(game, curr_depth+1))
+                game.pop_move()
         
         return util
             
 
-class AlphaBetaPlayer(IsolationPlayer):
+class AlphaBetaPlayer(SearchPlayer):
     """Game-playing agent that chooses a move using iterative deepening minimax
     search with alpha-beta pruning. You must finish and test this player to
     make sure it returns a good move before the search time limit expires.
+
+    Search results are cached in a transposition table that is kept across
+    iterations and across successive `get_move()` calls in the same game, and
+    moves are tried in the order chosen by a `MoveOrderer`.
+
+    Once the players are partitioned (see `Board.is_partitioned()`) and the
+    player's own region has at most `endgame_cells` open cells, the search
+    is replaced by an exact solver that follows the longest knight's path
+    through that region. Solved (location, cells) pairs are memoized for the
+    rest of the game, so the following moves are usually instant.
+
+    After each call to `get_move()`, `stats` holds a `SearchStats` record for
+    the search, which is also appended to `stats_log`.
+
+    Parameters
+    ----------
+    tt_entries : int (optional)
+        Maximum number of positions held by the transposition table. A value
+        of zero disables the table.
+
+    move_ordering : bool (optional)
+        Order moves using the PV move, killer moves and history heuristic
+        instead of the random order returned by `Board.get_legal_moves()`.
+
+    endgame_cells : int (optional)
+        Largest region, in open cells, handed to the exact endgame solver
+        once the players are partitioned. A value of zero disables it.
+
+    book : object (optional)
+        An opening book consulted before searching (see `SearchPlayer`).
+        `stats` is None after a move is played from the book.
+
+    pvs : bool (optional)
+        Use principal variation search: only the first move at each node is
+        searched with the full window, and the others with a null window
+        that merely proves them no better, re-searching the rare ones that
+        fail high.
+
+    aspiration : float (optional)
+        Half-width of the aspiration window that each iteration of iterative
+        deepening opens around the previous iteration's value. A root search
+        that falls outside the window is repeated with that side opened. A
+        value of zero searches every iteration with the full window.
+
+    ponder : bool (optional)
+        After each searched move, keep searching the position the opponent
+        has to answer in a helper process until the next call to
+        `get_move()` (or to `stop_pondering()`), so that the transposition
+        table (shared with the helper, as for `smp_workers`) already holds
+        deep results for the likely replies. The helper runs at the lowest
+        scheduling priority, so it only takes CPU time that no other process
+        wants. On a machine without a spare core, it still competes with an
+        opponent searching in the same process (e.g., in `Board.play`)
+        through the cache and memory bandwidth. Pondering therefore
+        invalidates the per-move timing of tournaments played in one process
+        unless every game has a free core for the helper.
+
+    smp_workers : int (optional)
+        Number of helper processes for a parallel (Lazy SMP) search. The
+        helpers are started by the first call to `get_move()` and stay alive
+        between moves; during each search they run their own iterative
+        deepening on the same root, half of them one ply ahead, and share
+        the transposition table with this player through shared memory, so
+        the main search finds much of its tree already searched. The move of
+        the deepest iteration completed by any process is played. Call
+        `close()` to stop the helpers. Players with helpers cannot run
+        inside a `multiprocessing.Pool` worker, whose processes may not
+        start children.
     """
+    # Number of memoized endgame paths above which the memo is dropped
+    MAX_PATHS = 1 << 18
+
+    def __init__(self, search_depth=3, score_fn=custom_score, timeout=10.,
+                 tt_entries=1 << 16, move_ordering=True, node_limit=None,
+                 endgame_cells=32, book=None, pvs=True, aspiration=2.,
+                 ponder=False, smp_workers=0):
+        super().__init__(search_depth, score_fn, timeout, node_limit, book)
+        if smp_workers or ponder:
+            self.tt = SharedTranspositionTable(tt_entries or 1 << 16)
+        else:
+            self.tt = TranspositionTable(tt_entries) if tt_entries else None
+        self.ordering = MoveOrderer() if move_ordering else None
+        self.pvs = pvs
+        self.aspiration = aspiration
+        self.leaves = 0
+        self.cutoffs = 0
+        self.researches = 0
+        self.fail_lows = 0
+        self.fail_highs = 0
+        self._fail_high_move = None
+        self.stats = None
+        self.stats_log = []
+        self.endgame_cells = endgame_cells
+        self._paths = {}
+        self._last_move_count = None
+        self.ponder = ponder
+        self._ponderer = None
+        self._pondering = False
+        self._ponder_depth = 0
+        self.smp_workers = smp_workers
+        self._helpers = None
+        self._helpers_busy = False
+        self._helper_depth = 0
+
+    def _start_game(self, game):
+        """Clear the transposition table, the move ordering history and the
+        endgame memo when `game` is not a continuation of the game searched
+        by the previous call to `get_move()`.
+
+        Values in the table are scored from this player's point of view, so
+        they cannot be reused once a new game (possibly from the other seat)
+        begins. Forgetting the history as well makes every game independent
+        of the games played before it, so a tournament gives the same
+        results whether its games are played in one process or spread over
+        a pool. Consecutive turns in one game always advance the move count.
+        """
+        if (self._last_move_count is None or
+                game.move_count <= self._last_move_count or
+                (game.move_count - self._last_move_count) % 2):
+            if self.tt is not None:
+                self.tt.clear()
+            if self.ordering is not None:
+                self.ordering.clear()
+            self._paths.clear()
+        elif len(self._paths) > self.MAX_PATHS:
+            self._paths.clear()
+        self._last_move_count = game.move_count
 
     def get_move(self, game, time_left):
         """Search for the best move from the available legal moves and return a
@@ -426,28 +1016,352 @@ class AlphaBetaPlayer(IsolationPlayer):
             Board coordinates corresponding to a legal move; may return
             (-1, -1) if there are no available legal moves.
         """
-        self.time_left = time_left
+        self.stop_pondering()
+        self._wait_for_helpers()
+        self._start_clock(time_left)
+        self._start_game(game)
+
+        # Play instantly if the position is in the opening book
+        book_move = self._book_move(game)
+        if book_move is not None:
+            self.stats = None
+            return book_move
+
+        if self.ordering is not None:
+            self.ordering.new_search()
+        self.leaves = 0
+        self.cutoffs = 0
+        self.researches = 0
+        self.fail_lows = 0
+        self.fail_highs = 0
+        self._helper_depth = 0
+        start = time_left()
+        tt_start = (self.tt.probes, self.tt.hits) if self.tt is not None else (0, 0)
+        iterations = []
 
         # Initialize the best move so that this function returns something
         # in case the search fails due to timeout
         best_move = (-1, -1)
-        
+
+        # Play a solved endgame exactly once the players are partitioned
+        if (self.endgame_cells and game.is_partitioned() and
+                _popcount(game.get_index_region_mask(game.active_index)) <=
+                self.endgame_cells):
+            # Give the solver half of the time, then fall back on the search;
+            # the memo keeps its progress for the next move
+            budget = (time_left() - self.TIMER_THRESHOLD) / 2.
+            self._start_clock(lambda: time_left() - budget)
+            best_move, length, solved = self._solve_endgame(game)
+            self.time_left = time_left
+            if solved:
+                self.stats = self._search_stats(game, [], tt_start, start - time_left())
+                self.stats = self.stats._replace(depth=length, endgame=True)
+                self.stats_log.append(self.stats)
+                return best_move
+            self._reset_clock()
+
+        # Set the helpers of a parallel search to work on the same root; they
+        # stop one margin early so that this search finishes undisturbed
+        if self.smp_workers:
+            self._start_helpers(game, time_left() - self.TIMER_THRESHOLD)
+
+        # No search can go deeper than the number of open cells
+        max_depth = len(game.get_blank_spaces())
+
         # Initialize depth and begin iterative deepening
         depth = 1
+        util = None
 
         while True:
+            nodes, remaining = self.nodes, time_left()
             try:
                 # Let alphabeta return, then increase the depth and re-search
-                best_move = self.alphabeta(game, depth)
-                depth += 1
+                best_move, util = self._aspiration_root(game, depth, util)
 
-            # Time's up, break the loop and return the best move
+            # Time's up, break the loop and return the best move, or a move
+            # that already failed high in the unfinished iteration
             except SearchTimeout:
-                return best_move
+                if self._fail_high_move is not None:
+                    best_move = self._fail_high_move
+                break
+            iterations.append((self.nodes - nodes, remaining - time_left()))
+
+            # Stop early if the iteration proved a win or loss, or if every
+            # line ended in a terminal state before reaching the depth limit
+            # (so searching deeper would only repeat the same work)
+            if (best_move == (-1, -1) or math.isinf(util) or
+                    not self._reached_horizon or depth >= max_depth):
+                break
+            depth += 1
+
+        if self.smp_workers:
+            best_move = self._stop_helpers(len(iterations), best_move)
+        self.stats = self._search_stats(game, iterations, tt_start, start - time_left())
+        self.stats_log.append(self.stats)
+        if self.ponder and best_move != (-1, -1):
+            self._start_pondering(game.forecast_move(best_move))
+        return best_move
 
-        # We searched the entire tree before time was up, so return
+    def _aspiration_root(self, game, depth, guess):
+        """Search the root to `depth` plies inside an aspiration window around
+        `guess` (the value of the previous iteration, or None for a full
+        window), and return the (move, utility) pair of the best move.
+
+        When the result falls outside the window, the search is repeated
+        with that side of the window opened. A move that fails high is
+        already known to beat the guess, so it is kept as the best move in
+        case the time runs out during the repeated search.
+        """
+        self._fail_high_move = None
+        alpha, beta = float("-inf"), float("inf")
+        if self.aspiration and guess is not None and not math.isinf(guess):
+            alpha, beta = guess - self.aspiration, guess + self.aspiration
+        while True:
+            move, util = self._alphabeta_root(game, depth, alpha, beta)
+            if util <= alpha and not math.isinf(alpha):
+                self.fail_lows += 1
+                alpha = float("-inf")
+            elif util >= beta and not math.isinf(beta):
+                self.fail_highs += 1
+                self._fail_high_move = move
+                beta = float("inf")
+            else:
+                return move, util
+
+    def _start_pondering(self, game):
+        """Search `game`, the position left to the opponent, in the ponder
+        helper process (starting it on first use) until `stop_pondering()`
+        is called.
+        """
+        if self._ponderer is None:
+            self._ponderer = self._spawn_helpers(1, ponder=True)
+        _, connections, stop, results = self._ponderer
+        stop.value = 0
+        results[0] = 0
+        # The clock runs down from an arbitrary hour; the stop flag ends it
+        connections[0].send((game.with_players("Player1", "Player2"), 3.6e6))
+        self._pondering = True
+
+    def _ponder(self, game, time_left):
+        """Run iterative deepening from the opponent's side of `game`, storing
+        the results in the transposition table, until `time_left` reports
+        that the search must stop or the position is solved.
+        """
+        self._start_clock(time_left)
+        self._ponder_depth = 0
+        max_depth = len(game.get_blank_spaces())
+        depth = 1
+        try:
+            while depth <= max_depth:
+                self._reached_horizon = False
+                util = self.ab_min_value(game, depth, float("-inf"), float("inf"), 1)
+                self._ponder_depth = depth
+                if math.isinf(util) or not self._reached_horizon:
+                    break
+                depth += 1
+        except SearchTimeout:
+            pass
+
+    def stop_pondering(self):
+        """Stop the background search started after the previous move, if
+        any, and wait for it to finish. Call it when a game ends so that the
+        player does not keep searching a finished game.
+        """
+        if not self._pondering:
+            # Nothing was pondered since the previous move
+            self._ponder_depth = 0
+            return
+        _, connections, stop, _ = self._ponderer
+        stop.value = 1
+        self._ponder_depth = connections[0].recv()
+        self._pondering = False
+
+    def _spawn_helpers(self, count, ponder=False):
+        """Start `count` helper processes sharing this player's transposition
+        table and return the (processes, connections, stop, results) tuple
+        used to send them positions. Ponder helpers lower their priority and
+        keep the node limit of the player.
+        """
+        # Imported here so that agents that search in a single process never
+        # need child processes
+        import multiprocessing
+        options = dict(score_fn=self.score, timeout=self.TIMER_THRESHOLD,
+                       move_ordering=self.ordering is not None, pvs=self.pvs,
+                       aspiration=self.aspiration)
+        if ponder:
+            options["node_limit"] = self.node_limit
+        stop = multiprocessing.RawValue("b", 1)
+        results = multiprocessing.RawArray("Q", count)
+        processes, connections = [], []
+        for index in range(count):
+            conn, child_conn = multiprocessing.Pipe()
+            process = multiprocessing.Process(
+                target=_smp_helper, daemon=True,
+                args=(index, self.tt, stop, results, child_conn, options,
+                      ponder))
+            process.start()
+            child_conn.close()
+            processes.append(process)
+            connections.append(conn)
+        return processes, connections, stop, results
+
+    def _start_helpers(self, game, time_left):
+        """Send `game` to the helper processes (starting them on first use)
+        to search until `_stop_helpers()` is called or `time_left`
+        milliseconds have passed.
+        """
+        if self._helpers is None:
+            self._helpers = self._spawn_helpers(self.smp_workers)
+
+        _, connections, stop, results = self._helpers
+        stop.value = 0
+        for index in range(self.smp_workers):
+            results[index] = 0
+        position = game.with_players("Player1", "Player2")
+        for conn in connections:
+            conn.send((position, time_left))
+        self._helpers_busy = True
+
+    def _stop_helpers(self, depth, best_move):
+        """Tell the helpers to stop searching, without waiting for them, and
+        return the move of the deepest iteration completed by any process,
+        given the `depth` and `best_move` of this player's own search.
+        """
+        _, _, stop, results = self._helpers
+        stop.value = 1
+        for result in results:
+            # Each result packs the depth and the move coordinates plus one
+            if result >> 16 > self._helper_depth and result & 0xFFFF:
+                self._helper_depth = result >> 16
+                if self._helper_depth > depth:
+                    best_move = ((result >> 8 & 0xFF) - 1, (result & 0xFF) - 1)
         return best_move
 
+    def _wait_for_helpers(self):
+        """Wait until every helper has abandoned the previous search."""
+        if self._helpers_busy:
+            for conn in self._helpers[1]:
+                conn.recv()
+            self._helpers_busy = False
+
+    def close(self):
+        """Stop pondering and shut down the helper processes of a parallel
+        search and of pondering, if any. The helpers are started again if
+        the player is used for another move.
+        """
+        self.stop_pondering()
+        self._wait_for_helpers()
+        for helpers in (self._helpers, self._ponderer):
+            if helpers is not None:
+                processes, connections, _, _ = helpers
+                for conn in connections:
+                    conn.send(None)
+                    conn.close()
+                for process in processes:
+                    process.join()
+        self._helpers = self._ponderer = None
+
+    def _search_stats(self, game, iterations, tt_start, time_ms):
+        """Build the `SearchStats` record for the search that just finished.
+
+        Parameters
+        ----------
+        iterations : list<(int, float)>
+            The node count and elapsed milliseconds of every completed
+            iteration of iterative deepening, in order.
+
+        tt_start : (int, int)
+            The transposition table probe and hit counters before the search.
+        """
+        depth = len(iterations)
+        if depth >= 2 and iterations[-2][0]:
+            ebf = iterations[-1][0] / iterations[-2][0]
+        elif depth:
+            ebf = iterations[-1][0] ** (1. / depth)
+        else:
+            ebf = 0.
+        probes = hits = 0
+        if self.tt is not None:
+            probes = self.tt.probes - tt_start[0]
+            hits = self.tt.hits - tt_start[1]
+        first_move_rate = 0.
+        if self.ordering is not None:
+            first_move_rate = self.ordering.first_move_cutoff_rate
+        return SearchStats(
+            move_count=game.move_count, depth=depth, nodes=self.nodes,
+            leaves=self.leaves, cutoffs=self.cutoffs, ebf=ebf,
+            iteration_times=[ms for _, ms in iterations], tt_probes=probes,
+            tt_hits=hits, tt_hit_rate=hits / probes if probes else 0.,
+            first_move_cutoff_rate=first_move_rate, time_ms=time_ms,
+            endgame=False, ponder_depth=self._ponder_depth,
+            pvs_researches=self.researches, fail_lows=self.fail_lows,
+            fail_highs=self.fail_highs, helper_depth=self._helper_depth)
+
+    def _solve_endgame(self, game):
+        """Return the first move and the length of the longest knight's path
+        for the active player through its own region of a partitioned board,
+        and whether the solver finished before the time ran out.
+
+        Moves are tried in Warnsdorff order (fewest onward moves first), so
+        an unfinished solve still returns the best path found so far, or
+        failing that the Warnsdorff move.
+        """
+        neighbours = game.get_knight_masks()
+        height = game.height
+        light = 0
+        for idx in range(game.width * height):
+            if (idx % height + idx // height) % 2 == 0:
+                light |= 1 << idx
+        region = game.get_index_region_mask(game.active_index)
+
+        def onward(move):
+            return _popcount(neighbours[move[0] + move[1] * height] & region)
+
+        legal_moves = sorted(game.get_legal_moves(), key=onward)
+        if not legal_moves:
+            return (-1, -1), 0, True
+        row, col = game.get_index_location(game.active_index)
+        bound = _path_bound(light, row + col * height, region)
+        best_move, best_length = legal_moves[0], 0
+        try:
+            for move in legal_moves:
+                cell = move[0] + move[1] * height
+                length = 1 + self._longest_path(neighbours, light, cell,
+                                                region & ~(1 << cell))
+                if length > best_length:
+                    best_move, best_length = move, length
+                    if length == bound:
+                        break
+        except SearchTimeout:
+            return best_move, best_length, False
+        return best_move, best_length, True
+
+    def _longest_path(self, neighbours, light, loc, cells):
+        """Return the number of moves in the longest knight's path from cell
+        index `loc` that only visits the open cells in the bitmask `cells`.
+
+        Results are memoized by location and reachable cells, and the search
+        stops as soon as a path meets the colour bound of `_path_bound()`.
+        """
+        cells = _reachable(neighbours, loc, cells)
+        key = (loc, cells)
+        length = self._paths.get(key)
+        if length is None:
+            self.nodes += 1
+            if self.nodes >= self._next_check:
+                self._check_clock()
+
+            bound = _path_bound(light, loc, cells)
+            length = 0
+            moves = neighbours[loc] & cells
+            while moves and length < bound:
+                low = moves & -moves
+                moves ^= low
+                length = max(length, 1 + self._longest_path(
+                    neighbours, light, low.bit_length() - 1, cells ^ low))
+            self._paths[key] = length
+        return length
+
     def alphabeta(self, game, depth, alpha=float("-inf"), beta=float("inf")):
         """Implement depth-limited minimax search with alpha-beta pruning as
         described in the lectures.
@@ -493,39 +1407,110 @@ class AlphaBetaPlayer(IsolationPlayer):
                 each helper function or else your agent will timeout during
                 testing.
         """
-        if self.time_left() < self.TIMER_THRESHOLD:
-            raise SearchTimeout()
+        self._reset_clock()
+        return self._alphabeta_root(game, depth, alpha, beta)[0]
+
+    def _alphabeta_root(self, game, depth, alpha=float("-inf"), beta=float("inf")):
+        """Search the root of the game tree to `depth` plies and return a
+        (move, utility) pair for the best move found.
+
+        Also sets `self._reached_horizon` to whether any line of play was cut
+        off by the depth limit (rather than ending in a terminal state), which
+        tells iterative deepening whether a deeper search could differ.
+        """
+        self.nodes += 1
+        if self.nodes >= self._next_check:
+            self._check_clock()
+
+        self._reached_horizon = False
 
         # Get the current player's legal moves
         legal_moves = game.get_legal_moves()
         
         # No remaining legal moves - is this a forfeit?
         if not legal_moves:
-            return (-1, -1)
+            return (-1, -1), float("-inf")
         
         """
         Begin the alphabeta calculation by calling ab_max_value as the root
         Note: Alpha and beta are initialized by the constructor to -inf/+inf
-        Note the "1" while calling ab_min_value
-        We pass this because from the root, this is the first level searched
+        Note the "depth - 1" and "1" while calling ab_min_value: the remaining
+        depth and the ply, as the children of the root are the first level searched
         """
         # Initalize OOB / Worst Case
         best_move = (-1, -1)
         
+        # Search a private copy with push_move/pop_move so a timeout can
+        # abandon it halfway through a move without corrupting the caller's board
+        game = game.copy()
+        
+        # Try the best move of the previous iteration first
+        orig_alpha = alpha
+        pv_move = None
+        if self.tt is not None:
+            key = game.hash()
+            entry = self.tt.probe(key)
+            if entry is not None:
+                pv_move = entry[4]
+        if self.ordering is not None:
+            self.ordering.order(legal_moves, 0, 0, pv_move)
+        
         # Examine every child of the root becase we need to see at least one
-        # leaf node of every subtree before pruning
-        for move in legal_moves:
-            util = self.ab_min_value(game.forecast_move(move), 1, alpha, beta)
+        # leaf node of every subtree before pruning. The best value is kept
+        # even when it falls below the window, so that a search that fails
+        # low still returns a move and an upper bound on its value
+        best_util = float("-inf")
+        for i, move in enumerate(legal_moves):
+            game.push_move(move)
+            util = self._min_child(game, depth - 1, alpha, beta, 1, i == 0)
+            game.pop_move()
             
             # New best-choice detected, update the lower bound
-            if util >= alpha:
-                best_move = move
-                alpha = util
+            if util > best_util or best_move == (-1, -1):
+                best_move, best_util = move, util
+                if util >= beta:
+                    break
+                alpha = max(alpha, util)
+        
+        if self.tt is not None:
+            bound = (LOWER if best_util >= beta else
+                     UPPER if best_util <= orig_alpha else EXACT)
+            self.tt.store(key, depth, best_util, bound, best_move)
                 
-        return best_move
+        return best_move, best_util
+
+    def _min_child(self, game, depth, alpha, beta, ply, first):
+        """Return the value of a MIN node searched from its MAX parent.
+
+        With principal variation search, every child but the first is only
+        tested with a null window just above alpha, and is searched again
+        with the full window if the test shows that it improves on alpha.
+        """
+        if first or not self.pvs:
+            return self.ab_min_value(game, depth, alpha, beta, ply)
+        value = self.ab_min_value(game, depth, alpha,
+                                  math.nextafter(alpha, math.inf), ply)
+        if alpha < value < beta:
+            self.researches += 1
+            value = self.ab_min_value(game, depth, alpha, beta, ply)
+        return value
+
+    def _max_child(self, game, depth, alpha, beta, ply, first):
+        """Return the value of a MAX node searched from its MIN parent, using
+        a null window just below beta for all but the first child (see
+        `_min_child`).
+        """
+        if first or not self.pvs:
+            return self.ab_max_value(game, depth, alpha, beta, ply)
+        value = self.ab_max_value(game, depth, math.nextafter(beta, -math.inf),
+                                  beta, ply)
+        if alpha < value < beta:
+            self.researches += 1
+            value = self.ab_max_value(game, depth, alpha, beta, ply)
+        return value
                 
         
-    def ab_max_value(self, game, curr_depth, alpha, beta):
+    def ab_max_value(self, game, depth, alpha, beta, ply):
         """
         Finds the move with the highest utility value for the current state by
         traversing the entire game tree.
@@ -535,45 +1520,83 @@ class AlphaBetaPlayer(IsolationPlayer):
         
         Assumes the opponent is rational & playing to MINIMIZE utility
         """
-        # To avoid timing out
-        if self.time_left() < self.TIMER_THRESHOLD:
-            raise SearchTimeout()
+        # To avoid timing out, count the node and check the clock when due
+        self.nodes += 1
+        if self.nodes >= self._next_check:
+            self._check_clock()
                         
         # Get the legal moves for the current player
         legal_moves = game.get_legal_moves()
             
         # If max depth is this level or no legal moves remain, 
         # return the utility of the current state
-        if curr_depth == self.search_depth or len(legal_moves) == 0:
+        if depth == 0 or len(legal_moves) == 0:
+            if legal_moves:
+                self._reached_horizon = True
+            self.leaves += 1
             return self.score(game, self)
         
-        else:
-            # Assume that the current branch has the worst possible utility
-            # For MAX, this is the minimum value possible, -inf
-            util = float("-inf")
-            
-            # Looking at our legal moves, find one that returns the MAX utility of:
-                # 1) the worst case scenario
-                # 2) Our utility after MIN plays
-            for m in legal_moves:
-                util = max(
-                        util, 
-                        self.ab_min_value(game.forecast_move(m), curr_depth+1, alpha, beta)
-                           )
+        # Reuse a previous search of this position if it went deep enough,
+        # either returning its value or tightening the window with its bound
+        orig_alpha, orig_beta = alpha, beta
+        pv_move = None
+        if self.tt is not None:
+            key = game.hash()
+            entry = self.tt.probe(key)
+            if entry is not None:
+                pv_move = entry[4]
+                if entry[1] >= depth:
+                    # Unless the stored value is a proven win or loss, the
+                    # reused subtree may have been cut off by a depth limit
+                    if not math.isinf(entry[2]):
+                        self._reached_horizon = True
+                    if entry[3] == EXACT:
+                        return entry[2]
+                    elif entry[3] == LOWER:
+                        alpha = max(alpha, entry[2])
+                    else:
+                        beta = min(beta, entry[2])
+                    if alpha >= beta:
+                        return entry[2]
+        if self.ordering is not None:
+            self.ordering.order(legal_moves, ply, 0, pv_move)
+        
+        # Assume that the current branch has the worst possible utility
+        # For MAX, this is the minimum value possible, -inf
+        util = float("-inf")
+        best_move = legal_moves[0]
+        
+        # Looking at our legal moves, find one that returns the MAX utility of:
+            # 1) the worst case scenario
+            # 2) Our utility after MIN plays
+        for i, m in enumerate(legal_moves):
+            game.push_move(m)
+            value = self._min_child(game, depth-1, alpha, beta, ply+1, i == 0)
+            game.pop_move()
+            if value > util:
+                util, best_move = value, m
+        
+            # If we find a move that is better for MAX than our beta value 
+            # (MIN's best move seen during MAX's search), 
+            # prune the remaining moves & return immediately
+            if util >= beta:
+                self.cutoffs += 1
+                if self.ordering is not None:
+                    self.ordering.record_cutoff(m, ply, 0, depth, i)
+                break
             
-                # If we find a move that is better for MAX than our beta value 
-                # (MIN's best move seen during MAX's search), 
-                # prune the remaining moves & return immediately
-                if util >= beta:
-                    return util
-                
-                # Update alpha and continue
-                alpha = max(alpha, util)
+            # Update alpha and continue
+            alpha = max(alpha, util)
+        
+        if self.tt is not None:
+            bound = (LOWER if util >= orig_beta else
+                     UPPER if util <= orig_alpha else EXACT)
+            self.tt.store(key, depth, util, bound, best_move)
         
         return util
             
     
-    def ab_min_value(self, game, curr_depth, alpha, beta):
+    def ab_min_value(self, game, depth, alpha, beta, ply):
         """
         Finds the move with the lowest utility value for the current state by
         traversing the entire game tree.
@@ -583,39 +1606,138 @@ class AlphaBetaPlayer(IsolationPlayer):
         
         Assumes the opponent is rational & playing to MAXIMIZE utility
         """
-        # To avoid timing out
-        if self.time_left() < self.TIMER_THRESHOLD:
-            raise SearchTimeout()
+        # To avoid timing out, count the node and check the clock when due
+        self.nodes += 1
+        if self.nodes >= self._next_check:
+            self._check_clock()
             
         # Get the legal moves for the current player
         legal_moves = game.get_legal_moves()
             
         # If max depth is at this level or no legal moves remain, 
         # return the utility of the current state
-        if curr_depth == self.search_depth or len(legal_moves) == 0:
+        if depth == 0 or len(legal_moves) == 0:
+            if legal_moves:
+                self._reached_horizon = True
+            self.leaves += 1
             return self.score(game, self)
         
-        else:
-            # Assume that the current branch has the worst possible utility
-            # For MIN, this is the maximum value possible, +inf
-            util = float("inf")
+        # Reuse a previous search of this position if it went deep enough,
+        # either returning its value or tightening the window with its bound
+        orig_alpha, orig_beta = alpha, beta
+        pv_move = None
+        if self.tt is not None:
+            key = game.hash()
+            entry = self.tt.probe(key)
+            if entry is not None:
+                pv_move = entry[4]
+                if entry[1] >= depth:
+                    # Unless the stored value is a proven win or loss, the
+                    # reused subtree may have been cut off by a depth limit
+                    if not math.isinf(entry[2]):
+                        self._reached_horizon = True
+                    if entry[3] == EXACT:
+                        return entry[2]
+                    elif entry[3] == LOWER:
+                        alpha = max(alpha, entry[2])
+                    else:
+                        beta = min(beta, entry[2])
+                    if alpha >= beta:
+                        return entry[2]
+        if self.ordering is not None:
+            self.ordering.order(legal_moves, ply, 1, pv_move)
+        
+        # Assume that the current branch has the worst possible utility
+        # For MIN, this is the maximum value possible, +inf
+        util = float("inf")
+        best_move = legal_moves[0]
+        
+        # Looking at our legal moves, find one that returns the MIN utility of:
+            # 1) the worst case scenario
+            # 2) Our utility after MAX plays
+        for i, m in enumerate(legal_moves):
+            game.push_move(m)
+            value = self._max_child(game, depth-1, alpha, beta, ply+1, i == 0)
+            game.pop_move()
+            if value < util:
+                util, best_move = value, m
             
-            # Looking at our legal moves, find one that returns the MIN utility of:
-                # 1) the worst case scenario
-                # 2) Our utility after MAX plays
-            for m in legal_moves:
-                util = min(
-                        util, 
-                        self.ab_max_value(game.forecast_move(m), curr_depth+1, alpha, beta)
-                           )
-                
-                # If we find a move that is better for MIN than our alpha value 
-                # (MAX's best move seen during MIN's search), 
-                # prune the remaining moves & return immediately
-                if util <= alpha:
-                    return util
-                
-                # Update beta and continue
-                beta = min(beta, util)
+            # If we find a move that is better for MIN than our alpha value 
+            # (MAX's best move seen during MIN's search), 
+            # prune the remaining moves & return immediately
+            if util <= alpha:
+                self.cutoffs += 1
+                if self.ordering is not None:
+                    self.ordering.record_cutoff(m, ply, 1, depth, i)
+                break
+            
+            # Update beta and continue
+            beta = min(beta, util)
+        
+        if self.tt is not None:
+            bound = (LOWER if util >= orig_beta else
+                     UPPER if util <= orig_alpha else EXACT)
+            self.tt.store(key, depth, util, bound, best_move)
         
         return util
+
+
+def _smp_helper(index, tt, stop, results, conn, options, ponder=False):
+    """Run helper process `index` of a parallel `AlphaBetaPlayer` search.
+
+    The helper receives (game, time_left) tasks on `conn`, searches each
+    position with iterative deepening into the shared table `tt`, starting
+    one ply deeper when `index` is odd so that the helpers spread over two
+    depths, and writes the depth and move of every completed iteration to
+    `results[index]`. A search ends when `stop` is set or the time runs out,
+    and is acknowledged on `conn`. A task of None ends the process.
+
+    A `ponder` helper runs at the lowest priority and searches each position
+    from the side of the player that is not to move (see
+    `AlphaBetaPlayer._ponder`), acknowledging with the depth it completed.
+    """
+    import os
+    import timeit
+    player = AlphaBetaPlayer(tt_entries=0, endgame_cells=0, **options)
+    player.tt = tt
+    # Helpers forked from the same parent would share the random move order
+    random.seed()
+    if ponder and hasattr(os, "nice"):
+        os.nice(19)
+    while True:
+        task = conn.recv()
+        if task is None:
+            return
+        game, budget = task
+        me = game.active_index ^ ponder
+        game = game.with_players(*[player if i == me else "Opponent"
+                                   for i in (0, 1)])
+        start = timeit.default_timer()
+
+        def time_left():
+            if stop.value:
+                return float("-inf")
+            return budget - 1000 * (timeit.default_timer() - start)
+
+        if ponder:
+            player._ponder(game, time_left)
+            conn.send(player._ponder_depth)
+            continue
+
+        player._start_clock(time_left)
+        if player.ordering is not None:
+            player.ordering.new_search()
+        max_depth = len(game.get_blank_spaces())
+        depth = 1 + index % 2
+        util = None
+        try:
+            while depth <= max_depth:
+                move, util = player._aspiration_root(game, depth, util)
+                results[index] = depth << 16 | (move[0] + 1) << 8 | (move[1] + 1)
+                if (move == (-1, -1) or math.isinf(util) or
+                        not player._reached_horizon):
+                    break
+                depth += 1
+        except SearchTimeout:
+            pass
+        conn.send(depth)
@@ -0,0 +1,129 @@
+"""
+This file contains the `OpeningBook` class, which looks up precomputed moves
+for early positions in a binary file written by `write_book()` (see
+`build_book.py` for the tool that searches the positions).
+
+The file is an open-addressing hash table keyed by `Board.hash()`, so a
+lookup reads one or two fixed-size entries instead of parsing the book:
+
+    header   magic (8 bytes), width, height (1 byte each), 2 padding bytes,
+             number of slots (4 bytes, a power of two)
+    slots    key (8 bytes) and cell index (1 byte, row + col * height) per
+             slot, where a cell index of 255 marks an empty slot
+
+All integers are little-endian. Slot `key & (slots - 1)` is the first one
+tried for a key, followed by the next slots in turn (wrapping around) until
+the key or an empty slot is found.
+"""
+import mmap
+import struct
+
+MAGIC = b"ISOBOOK1"
+HEADER = struct.Struct("<8sBBxxI")
+ENTRY = struct.Struct("<QB")
+EMPTY = 0xFF
+
+
+def write_book(path, width, height, entries):
+    """Write an opening book file.
+
+    Parameters
+    ----------
+    path : str
+        The file to write.
+
+    width, height : int
+        The dimensions of the board the book applies to.
+
+    entries : dict<int, (int, int)>
+        The move to play, as a (row, column) pair, for each position keyed
+        by `Board.hash()`.
+    """
+    slots = 1
+    while slots < 2 * len(entries):
+        slots *= 2
+    table = [(0, EMPTY)] * slots
+    for key, (row, col) in sorted(entries.items()):
+        idx = key & (slots - 1)
+        while table[idx][1] != EMPTY:
+            idx = (idx + 1) & (slots - 1)
+        table[idx] = (key, row + col * height)
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, width, height, slots))
+        for key, cell in table:
+            f.write(ENTRY.pack(key, cell))
+
+
+class OpeningBook(object):
+    """Read-only view of an opening book file.
+
+    The file is only opened and memory-mapped by the first lookup, so
+    creating a book is free and the pages that are never probed are never
+    read. Books can be pickled (e.g., to pass players to a process pool);
+    each copy maps the file again when first used.
+
+    Parameters
+    ----------
+    path : str
+        An opening book file written by `write_book()`.
+    """
+    def __init__(self, path):
+        self.path = path
+        self._map = None
+
+    def __getstate__(self):
+        return {"path": self.path}
+
+    def __setstate__(self, state):
+        self.__init__(state["path"])
+
+    def _open(self):
+        """Map the book file and read its header."""
+        with open(self.path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.width, self.height, slots = HEADER.unpack_from(self._map)
+        if magic != MAGIC:
+            raise ValueError("Not an opening book file: {}".format(self.path))
+        self._mask = slots - 1
+
+    def close(self):
+        """Unmap the book file; it is mapped again by the next lookup."""
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+
+    def __len__(self):
+        """Return the number of positions in the book."""
+        if self._map is None:
+            self._open()
+        return sum(ENTRY.unpack_from(self._map, offset)[1] != EMPTY
+                   for offset in range(HEADER.size, len(self._map), ENTRY.size))
+
+    def get_move(self, game):
+        """Return the book move for the active player of `game` as a (row,
+        column) pair, or None if the position is not in the book.
+        """
+        if self._map is None:
+            self._open()
+        if game.width != self.width or game.height != self.height:
+            return None
+        key = game.hash()
+        idx = key & self._mask
+        while True:
+            entry_key, cell = ENTRY.unpack_from(
+                self._map, HEADER.size + idx * ENTRY.size)
+            if cell == EMPTY:
+                return None
+            if entry_key == key:
+                move = (cell % self.height, cell // self.height)
+                # Guard against a hash collision with an unrelated position:
+                # the cell must be open and, once the active player has
+                # been placed, a knight's move away from it
+                loc = game.get_index_cell(game.active_index)
+                if loc is None:
+                    legal = game.move_is_legal(move)
+                else:
+                    legal = (game.get_knight_masks()[loc] &
+                             game.get_blank_mask()) >> cell & 1
+                return move if legal else None
+            idx = (idx + 1) & self._mask
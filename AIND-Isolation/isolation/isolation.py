@@ -9,10 +9,114 @@ be available to project reviewers.
 """
 import random
 import timeit
-from copy import copy
+
+from collections import namedtuple
 
 TIME_LIMIT_MILLIS = 150
 
+KNIGHT_DIRECTIONS = ((-2, -1), (-2, 1), (-1, -2), (-1, 2),
+                     (1, -2), (1, 2), (2, -1), (2, 1))
+
+
+_KNIGHT_TABLES = {}
+
+
+def _knight_tables(width, height):
+    """Return the (neighbours, cells) lookup tables for a board size.
+
+    `neighbours[idx]` is a bitmask of every on-board cell a knight can reach
+    from cell index `idx`, and `cells[idx]` is the (row, col) pair of that
+    cell. The tables only depend on the board dimensions, so they are built
+    once per size and shared by every Board instance.
+    """
+    key = (width, height)
+    tables = _KNIGHT_TABLES.get(key)
+    if tables is None:
+        neighbours = []
+        cells = []
+        for c in range(width):
+            for r in range(height):
+                mask = 0
+                for dr, dc in KNIGHT_DIRECTIONS:
+                    if 0 <= r + dr < height and 0 <= c + dc < width:
+                        mask |= 1 << (r + dr + (c + dc) * height)
+                neighbours.append(mask)
+                cells.append((r, c))
+        tables = _KNIGHT_TABLES[key] = (tuple(neighbours), tuple(cells))
+    return tables
+
+
+_ZOBRIST_KEYS = {}
+
+
+def _zobrist_keys(width, height):
+    """Return the (blocked, locations, side) Zobrist keys for a board size.
+
+    `blocked[idx]` is mixed into the hash while cell `idx` is blocked,
+    `locations[p][idx]` while player `p` (0 or 1) occupies cell `idx`, and
+    `side` while the second player holds the initiative. The keys come from
+    a generator seeded by the board size, so hashes are reproducible across
+    processes and runs (e.g., for keying files on disk).
+    """
+    key = (width, height)
+    keys = _ZOBRIST_KEYS.get(key)
+    if keys is None:
+        rng = random.Random("isolation-zobrist-{}x{}".format(width, height))
+        cells = width * height
+        blocked = tuple(rng.getrandbits(64) for _ in range(cells))
+        locations = tuple(tuple(rng.getrandbits(64) for _ in range(cells))
+                          for _ in range(2))
+        keys = _ZOBRIST_KEYS[key] = (blocked, locations, rng.getrandbits(64))
+    return keys
+
+
+class PositionTables(namedtuple("PositionTables", [
+        "cells", "center_sq", "center_abs", "pair_sq"])):
+    """Positional terms of the heuristics, precomputed for one board size
+    and indexed by cell index (see `Board.get_index_cell()`).
+
+    The terms only depend on the board size and the players' cells, so any
+    weighted linear heuristic can read them instead of computing distances
+    at every leaf. The center is (height / 2, width / 2), as in the
+    heuristics of `game_agent.py` and `sample_players.center_score`.
+
+    Attributes
+    ----------
+    cells : int
+        The number of cells on the board.
+
+    center_sq, center_abs : tuple<float>
+        The squared Euclidean and the Manhattan distance from each cell to
+        the center of the board.
+
+    pair_sq : tuple<int>
+        The squared Euclidean distance between cells `i` and `j`, at index
+        `i * cells + j`.
+    """
+    __slots__ = ()
+
+
+_POSITION_TABLES = {}
+
+
+def position_tables(width, height):
+    """Return the `PositionTables` of a board size, built on first use."""
+    key = (width, height)
+    tables = _POSITION_TABLES.get(key)
+    if tables is None:
+        center_width, center_height = width / 2.0, height / 2.0
+        locations = [(idx % height, idx // height)
+                     for idx in range(width * height)]
+        tables = _POSITION_TABLES[key] = PositionTables(
+            cells=width * height,
+            center_sq=tuple((center_height - r)**2 + (center_width - c)**2
+                            for r, c in locations),
+            center_abs=tuple(abs(center_height - r) + abs(center_width - c)
+                             for r, c in locations),
+            pair_sq=tuple((r2 - r1)**2 + (c2 - c1)**2
+                          for r1, c1 in locations for r2, c2 in locations))
+    return tables
+
 
 class Board(object):
     """Implement a model for the game Isolation assuming each player moves like
@@ -37,37 +141,99 @@ class Board(object):
     BLANK = 0
     NOT_MOVED = None
 
+    # Millions of boards are created during a tournament, so instances keep
+    # a fixed set of attributes instead of a per-instance __dict__
+    __slots__ = ("width", "height", "move_count", "_players", "_active",
+                 "_blank", "_p1_loc", "_p2_loc", "_neighbours", "_cells",
+                 "_undo", "_zobrist", "_hash")
+
     def __init__(self, player_1, player_2, width=7, height=7):
         self.width = width
         self.height = height
         self.move_count = 0
-        self._player_1 = player_1
-        self._player_2 = player_2
-        self._active_player = player_1
-        self._inactive_player = player_2
 
-        # The last 3 entries of the board state includes initiative (0 for
-        # player 1, 1 for player 2) player 2 last move, and player 1 last move
-        self._board_state = [Board.BLANK] * (width * height + 3)
-        self._board_state[-1] = Board.NOT_MOVED
-        self._board_state[-2] = Board.NOT_MOVED
+        # Players are tracked internally by index: 0 for player 1 and 1 for
+        # player 2, with `_active` holding the index of the active player
+        self._players = (player_1, player_2)
+        self._active = 0
+
+        # The board is stored as a bitboard: cell (row, col) maps to bit
+        # `row + col * height` of `_blank`, which is set while the cell is
+        # open. Player locations are stored as cell indices (or NOT_MOVED).
+        self._blank = (1 << (width * height)) - 1
+        self._p1_loc = Board.NOT_MOVED
+        self._p2_loc = Board.NOT_MOVED
+        self._neighbours, self._cells = _knight_tables(width, height)
+        self._undo = []
+
+        # 64-bit Zobrist key of the position, updated incrementally by
+        # apply_move(); the empty board with player 1 to move hashes to 0
+        self._zobrist = _zobrist_keys(width, height)
+        self._hash = 0
 
     def hash(self):
-        return str(self._board_state).__hash__()
+        """Return a 64-bit Zobrist hash of the current state, covering the
+        blocked cells, both player locations and the player with initiative.
+        """
+        return self._hash
 
     @property
     def active_player(self):
         """The object registered as the player holding initiative in the
         current game state.
         """
-        return self._active_player
+        return self._players[self._active]
 
     @property
     def inactive_player(self):
         """The object registered as the player in waiting for the current
         game state.
         """
-        return self._inactive_player
+        return self._players[self._active ^ 1]
+
+    @property
+    def active_index(self):
+        """The index (0 for player 1, 1 for player 2) of the player holding
+        initiative in the current game state.
+        """
+        return self._active
+
+    def player_index(self, player):
+        """Return the index of a registered player: 0 for the first player
+        and 1 for the second.
+
+        Players are matched by identity before falling back to `==`, so the
+        common case never calls a user-defined `__eq__`.
+
+        Parameters
+        ----------
+        player : object
+            An object registered as a player in the current game. Raises an
+            error if the supplied object is not registered as a player in
+            this game.
+
+        Returns
+        -------
+        int
+            The index of the player.
+        """
+        idx = self.__index(player)
+        if idx < 0:
+            raise RuntimeError("`player` must be an object registered as a player in the current game.")
+        return idx
+
+    def __index(self, player):
+        """Return the index of a player, or -1 if it is not registered."""
+        players = self._players
+        if player is players[0]:
+            return 0
+        if player is players[1]:
+            return 1
+        if player == players[0]:
+            return 0
+        if player == players[1]:
+            return 1
+        return -1
 
     def get_opponent(self, player):
         """Return the opponent of the supplied player.
@@ -84,19 +250,33 @@ class Board(object):
         object
             The opponent of the input player object.
         """
-        if player == self._active_player:
-            return self._inactive_player
-        elif player == self._inactive_player:
-            return self._active_player
-        raise RuntimeError("`player` must be an object registered as a player in the current game.")
+        return self._players[self.player_index(player) ^ 1]
 
     def copy(self):
         """ Return a deep copy of the current board. """
-        new_board = Board(self._player_1, self._player_2, width=self.width, height=self.height)
+        new_board = Board.__new__(Board)
+        new_board.width = self.width
+        new_board.height = self.height
         new_board.move_count = self.move_count
-        new_board._active_player = self._active_player
-        new_board._inactive_player = self._inactive_player
-        new_board._board_state = copy(self._board_state)
+        new_board._players = self._players
+        new_board._active = self._active
+        new_board._blank = self._blank
+        new_board._p1_loc = self._p1_loc
+        new_board._p2_loc = self._p2_loc
+        new_board._neighbours = self._neighbours
+        new_board._cells = self._cells
+        new_board._undo = []
+        new_board._zobrist = self._zobrist
+        new_board._hash = self._hash
+        return new_board
+
+    def with_players(self, player_1, player_2):
+        """Return a copy of the current board with the two players replaced,
+        e.g., to send the position to another process without the agents
+        that are playing it.
+        """
+        new_board = self.copy()
+        new_board._players = (player_1, player_2)
         return new_board
 
     def forecast_move(self, move):
@@ -134,13 +314,18 @@ class Board(object):
         """
         idx = move[0] + move[1] * self.height
         return (0 <= move[0] < self.height and 0 <= move[1] < self.width and
-                self._board_state[idx] == Board.BLANK)
+                (self._blank >> idx) & 1 == 1)
 
     def get_blank_spaces(self):
         """Return a list of the locations that are still available on the board.
         """
-        return [(i, j) for j in range(self.width) for i in range(self.height)
-                if self._board_state[i + j * self.height] == Board.BLANK]
+        return self.__to_moves(self._blank)
+
+    def get_blank_mask(self):
+        """Return the open cells on the board as an integer bitmask, where
+        cell (row, column) corresponds to bit `row + column * height`.
+        """
+        return self._blank
 
     def get_player_location(self, player):
         """Find the current location of the specified player on the board.
@@ -156,20 +341,34 @@ class Board(object):
             The coordinate pair (row, column) of the input player, or None
             if the player has not moved.
         """
-        if player == self._player_1:
-            if self._board_state[-1] == Board.NOT_MOVED:
-                return Board.NOT_MOVED
-            idx = self._board_state[-1]
-        elif player == self._player_2:
-            if self._board_state[-2] == Board.NOT_MOVED:
-                return Board.NOT_MOVED
-            idx = self._board_state[-2]
-        else:
+        idx = self.__index(player)
+        if idx < 0:
             raise RuntimeError(
                 "Invalid player in get_player_location: {}".format(player))
-        w = idx // self.height
-        h = idx % self.height
-        return (h, w)
+        return self.get_index_location(idx)
+
+    def get_index_location(self, index):
+        """Find the current location of the player with the given index (0 for
+        player 1, 1 for player 2).
+
+        Returns
+        -------
+        (int, int) or None
+            The coordinate pair (row, column) of the player, or None if the
+            player has not moved.
+        """
+        loc = self._p2_loc if index else self._p1_loc
+        if loc == Board.NOT_MOVED:
+            return Board.NOT_MOVED
+        return self._cells[loc]
+
+    def get_index_cell(self, index):
+        """Return the cell index (`row + col * height`) of the player with the
+        given index (0 for player 1, 1 for player 2), or None if the player
+        has not moved. Cell indices address per-cell lookup tables without
+        building a coordinate pair.
+        """
+        return self._p2_loc if index else self._p1_loc
 
     def get_legal_moves(self, player=None):
         """Return the list of all legal moves for the specified player.
@@ -187,8 +386,99 @@ class Board(object):
             for the player constrained by the current game state.
         """
         if player is None:
-            player = self.active_player
-        return self.__get_moves(self.get_player_location(player))
+            idx = self._active
+        else:
+            idx = self.__index(player)
+            if idx < 0:
+                raise RuntimeError(
+                    "Invalid player in get_legal_moves: {}".format(player))
+        return self.get_index_legal_moves(idx)
+
+    def get_index_legal_moves(self, index):
+        """Return the list of all legal moves for the player with the given
+        index (0 for player 1, 1 for player 2).
+        """
+        return self.__get_moves(self._p2_loc if index else self._p1_loc)
+
+    def count_legal_moves(self, player=None):
+        """Return the number of legal moves for the specified player (or the
+        active player if None) without building the list of moves.
+        """
+        return bin(self.__player_moves(player, "count_legal_moves")).count("1")
+
+    def has_legal_moves(self, player=None):
+        """Return True if the specified player (or the active player if None)
+        has at least one legal move.
+        """
+        return self.__player_moves(player, "has_legal_moves") != 0
+
+    def get_mobility(self, player):
+        """Return the terminal status and the mobility of both players in one
+        call, as a tuple (utility, own_moves, opp_moves): the value of
+        `utility(player)`, and the number of legal moves of the specified
+        player and of its opponent.
+        """
+        idx = self.__index(player)
+        if idx < 0:
+            raise RuntimeError(
+                "Invalid player in get_mobility: {}".format(player))
+        own = self.__moves_mask(self._p2_loc if idx else self._p1_loc)
+        opp = self.__moves_mask(self._p1_loc if idx else self._p2_loc)
+        utility = 0.
+        if idx == self._active:
+            if not own:
+                utility = float("-inf")
+        elif not opp:
+            utility = float("inf")
+        return utility, bin(own).count("1"), bin(opp).count("1")
+
+    def get_knight_masks(self):
+        """Return a tuple holding, for each cell index, the bitmask of every
+        cell on the board a knight can reach from that cell (ignoring which
+        cells are open). The tuple is shared by every board of this size.
+        """
+        return self._neighbours
+
+    def get_region_mask(self, player):
+        """Return the bitmask of the open cells the specified player could
+        still reach by any sequence of knight moves through open cells,
+        ignoring the moves of the opponent. A player that has not moved can
+        reach every open cell.
+        """
+        idx = self.__index(player)
+        if idx < 0:
+            raise RuntimeError(
+                "Invalid player in get_region_mask: {}".format(player))
+        return self.get_index_region_mask(idx)
+
+    def get_index_region_mask(self, index):
+        """Equivalent to get_region_mask, but takes the index of the player
+        (0 for player 1, 1 for player 2).
+        """
+        loc = self._p2_loc if index else self._p1_loc
+        if loc == Board.NOT_MOVED:
+            return self._blank
+        neighbours = self._neighbours
+        blank = self._blank
+        region = frontier = neighbours[loc] & blank
+        while frontier:
+            reached = 0
+            while frontier:
+                low = frontier & -frontier
+                reached |= neighbours[low.bit_length() - 1]
+                frontier ^= low
+            frontier = reached & blank & ~region
+            region |= frontier
+        return region
+
+    def is_partitioned(self):
+        """Test whether both players have moved and can no longer reach any
+        common open cell, so that neither move can ever affect the other
+        player and the game reduces to the longest path in each region.
+        """
+        if self._p1_loc == Board.NOT_MOVED or self._p2_loc == Board.NOT_MOVED:
+            return False
+        return not self.get_index_region_mask(0) & self.get_index_region_mask(1)
 
     def apply_move(self, move):
         """Move the active player to a specified location.
@@ -200,20 +490,51 @@ class Board(object):
             the active player on the board.
         """
         idx = move[0] + move[1] * self.height
-        last_move_idx = int(self.active_player == self._player_2) + 1
-        self._board_state[-last_move_idx] = idx
-        self._board_state[idx] = 1
-        self._board_state[-3] ^= 1
-        self._active_player, self._inactive_player = self._inactive_player, self._active_player
+        blocked, locations, side = self._zobrist
+        if self._active:
+            last, self._p2_loc = self._p2_loc, idx
+        else:
+            last, self._p1_loc = self._p1_loc, idx
+        keys = locations[self._active]
+        key = self._hash ^ blocked[idx] ^ keys[idx] ^ side
+        if last != Board.NOT_MOVED:
+            key ^= keys[last]
+        self._hash = key
+        self._blank &= ~(1 << idx)
+        self._active ^= 1
         self.move_count += 1
 
+    def push_move(self, move):
+        """Apply a move in place, remembering the current state so that it can
+        be restored by `pop_move()`. This is the allocation-free alternative
+        to `forecast_move()` for search routines.
+
+        Parameters
+        ----------
+        move : (int, int)
+            A coordinate pair (row, column) indicating the next position for
+            the active player on the board.
+        """
+        self._undo.append((self._blank, self._p1_loc, self._p2_loc, self._hash))
+        self.apply_move(move)
+
+    def pop_move(self):
+        """Undo the most recent move applied with `push_move()`, restoring the
+        exact previous state of the board.
+        """
+        if not self._undo:
+            raise RuntimeError("pop_move called without a matching push_move")
+        self._blank, self._p1_loc, self._p2_loc, self._hash = self._undo.pop()
+        self._active ^= 1
+        self.move_count -= 1
+
     def is_winner(self, player):
         """ Test whether the specified player has won the game. """
-        return player == self._inactive_player and not self.get_legal_moves(self._active_player)
+        return self.__index(player) == self._active ^ 1 and not self.__active_moves()
 
     def is_loser(self, player):
         """ Test whether the specified player has lost the game. """
-        return player == self._active_player and not self.get_legal_moves(self._active_player)
+        return self.__index(player) == self._active and not self.__active_moves()
 
     def utility(self, player):
         """Returns the utility of the current game state from the perspective
@@ -237,12 +558,13 @@ class Board(object):
             a value of -inf if the player has lost, and a value of 0
             otherwise.
         """
-        if not self.get_legal_moves(self._active_player):
+        if not self.__active_moves():
+            idx = self.__index(player)
 
-            if player == self._inactive_player:
+            if idx == self._active ^ 1:
                 return float("inf")
 
-            if player == self._active_player:
+            if idx == self._active:
                 return float("-inf")
 
         return 0.
@@ -254,14 +576,47 @@ class Board(object):
         if loc == Board.NOT_MOVED:
             return self.get_blank_spaces()
 
-        r, c = loc
-        directions = [(-2, -1), (-2, 1), (-1, -2), (-1, 2),
-                      (1, -2), (1, 2), (2, -1), (2, 1)]
-        valid_moves = [(r + dr, c + dc) for dr, dc in directions
-                       if self.move_is_legal((r + dr, c + dc))]
+        valid_moves = self.__to_moves(self.__moves_mask(loc))
         random.shuffle(valid_moves)
         return valid_moves
 
+    def __player_moves(self, player, caller):
+        """Return the bitmask of legal moves for the specified player (or the
+        active player if None), naming `caller` if the player is invalid.
+        """
+        if player is None:
+            idx = self._active
+        else:
+            idx = self.__index(player)
+            if idx < 0:
+                raise RuntimeError(
+                    "Invalid player in {}: {}".format(caller, player))
+        return self.__moves_mask(self._p2_loc if idx else self._p1_loc)
+
+    def __moves_mask(self, loc):
+        """Return a bitmask of the open cells a knight at cell index `loc`
+        can reach, or of every open cell if the player has not moved.
+        """
+        if loc == Board.NOT_MOVED:
+            return self._blank
+        return self._neighbours[loc] & self._blank
+
+    def __active_moves(self):
+        """Return the bitmask of legal moves for the active player."""
+        return self.__moves_mask(self._p2_loc if self._active else self._p1_loc)
+
+    def __to_moves(self, mask):
+        """Convert a bitmask of cell indices into a list of (row, col) pairs
+        in ascending index order.
+        """
+        cells = self._cells
+        moves = []
+        while mask:
+            low = mask & -mask
+            moves.append(cells[low.bit_length() - 1])
+            mask ^= low
+        return moves
+
     def print_board(self):
         """DEPRECATED - use Board.to_string()"""
         return self.to_string()
@@ -271,8 +626,8 @@ class Board(object):
         the location of each player and indicating which cells have been
         blocked, and which remain open.
         """
-        p1_loc = self._board_state[-1]
-        p2_loc = self._board_state[-2]
+        p1_loc = self._p1_loc
+        p2_loc = self._p2_loc
 
         col_margin = len(str(self.height - 1)) + 1
         prefix = "{:<" + "{}".format(col_margin) + "}"
@@ -282,7 +637,7 @@ class Board(object):
             out += prefix.format(i) + ' | '
             for j in range(self.width):
                 idx = i + j * self.height
-                if not self._board_state[idx]:
+                if (self._blank >> idx) & 1:
                     out += ' '
                 elif p1_loc == idx:
                     out += symbols[0]
@@ -295,7 +650,7 @@ class Board(object):
 
         return out
 
-    def play(self, time_limit=TIME_LIMIT_MILLIS):
+    def play(self, time_limit=TIME_LIMIT_MILLIS, move_times=None):
         """Execute a match between the players by alternately soliciting them
         to select a move and applying it in the game.
 
@@ -305,6 +660,10 @@ class Board(object):
             The maximum number of milliseconds to allow before timeout
             during each turn.
 
+        move_times : list (optional)
+            If given, the number of milliseconds taken by each call to
+            `get_move()` is appended to this list.
+
         Returns
         ----------
         (player, list<[(int, int),]>, str)
@@ -323,19 +682,21 @@ class Board(object):
 
             move_start = time_millis()
             time_left = lambda : time_limit - (time_millis() - move_start)
-            curr_move = self._active_player.get_move(game_copy, time_left)
+            curr_move = self.active_player.get_move(game_copy, time_left)
             move_end = time_left()
+            if move_times is not None:
+                move_times.append(time_limit - move_end)
 
             if curr_move is None:
                 curr_move = Board.NOT_MOVED
 
             if move_end < 0:
-                return self._inactive_player, move_history, "timeout"
+                return self.inactive_player, move_history, "timeout"
 
             if curr_move not in legal_player_moves:
                 if len(legal_player_moves) > 0:
-                    return self._inactive_player, move_history, "forfeit"
-                return self._inactive_player, move_history, "illegal move"
+                    return self.inactive_player, move_history, "forfeit"
+                return self.inactive_player, move_history, "illegal move"
 
             move_history.append(list(curr_move))
 
@@ -0,0 +1,257 @@
+"""
+This file contains the compact binary format used to store large numbers of
+finished games: `RecordWriter` appends games to a record file one at a time,
+`read_records()` streams them back as `GameRecord` tuples, and `replay()`
+steps through the positions of a game on an `isolation.Board`.
+
+A record file is the magic string b"ISOGAME1" followed by one record per
+game. Every record starts with its length, so a reader can skip a game
+without decoding it and an unfinished record at the end of the file (left
+by an interrupted writer) is detected and ignored:
+
+    header   length of the rest of the record (4 bytes), width, height,
+             flags, termination, winner, number of opening moves (1 byte
+             each), number of moves, number of searches (2 bytes each),
+             seed (8 bytes, signed), match (4 bytes)
+    players  the name of each player as its length (1 byte) and UTF-8 bytes
+    moves    cell index (1 byte, row + col * height) of every move,
+             including the opening moves
+    times    if flags & 1: milliseconds taken by each search, as 4-byte
+             floats
+    stats    if flags & 2: present/endgame bits, completed depth (1 byte
+             each), and nodes, leaves and cutoffs (4 bytes each) of each
+             search
+
+All integers are little-endian. The searches are the calls to `get_move()`
+made after the opening: one per move played, plus the final one that lost
+the game.
+"""
+import os
+import struct
+
+from collections import namedtuple
+
+from .isolation import Board
+
+MAGIC = b"ISOGAME1"
+HEADER = struct.Struct("<IBBBBBBHHqI")
+TIME = struct.Struct("<f")
+STATS = struct.Struct("<BBIII")
+
+HAS_TIMES = 1
+HAS_STATS = 2
+
+# Reasons returned by `Board.play()` for the end of a game, by code
+TERMINATIONS = ("timeout", "forfeit", "illegal move")
+
+MoveStats = namedtuple("MoveStats", ["depth", "nodes", "leaves", "cutoffs",
+                                     "endgame"])
+
+_cell_tables = {}
+
+
+class GameRecord(namedtuple("GameRecord", [
+        "width", "height", "players", "seed", "match", "termination",
+        "winner", "opening", "moves", "move_times", "stats"])):
+    """A finished game, as stored in a record file.
+
+    Attributes
+    ----------
+    width, height : int
+        The dimensions of the board.
+
+    players : (str, str)
+        The names of the first and second player.
+
+    seed, match : int
+        The random seed and match number the opening was drawn from (see
+        `tournament.make_opening()`).
+
+    termination : str
+        The reason the game ended, one of `TERMINATIONS`.
+
+    winner : int
+        The index of the winner: 0 for the first player, 1 for the second.
+
+    opening : int
+        The number of moves at the start of `moves` that were applied before
+        the players were asked for moves.
+
+    moves : list<(int, int)>
+        Every move of the game as a (row, column) pair, in order.
+
+    move_times : list<float> or None
+        The milliseconds taken by each search, or None if not recorded.
+
+    stats : list<MoveStats or None> or None
+        The statistics of each search (None for the searches of players
+        that do not keep statistics), or None if not recorded. Any object
+        with the attributes of `MoveStats` (e.g., `game_agent.SearchStats`)
+        can be written.
+    """
+    __slots__ = ()
+
+
+def _cells(width, height):
+    """Return the (row, column) pair of every cell index of a board size."""
+    key = (width, height)
+    if key not in _cell_tables:
+        _cell_tables[key] = [(idx % height, idx // height)
+                             for idx in range(width * height)]
+    return _cell_tables[key]
+
+
+def _record_ends(f):
+    """Return the offset after the last complete record of an open record
+    file, which must be positioned after the magic string.
+    """
+    end = f.seek(0, os.SEEK_END)
+    offset = len(MAGIC)
+    while offset + 4 <= end:
+        f.seek(offset)
+        length, = struct.unpack("<I", f.read(4))
+        if offset + 4 + length > end:
+            break
+        offset += 4 + length
+    return offset
+
+
+class RecordWriter(object):
+    """Append-only writer of a record file.
+
+    Each game is encoded and flushed as soon as it is written, so a reader
+    (or a tournament resumed after an interruption) sees every finished
+    game. Records are appended to an existing file, after removing an
+    unfinished record left at its end.
+
+    Parameters
+    ----------
+    path : str
+        The record file, which is created if it does not exist.
+    """
+    def __init__(self, path):
+        self.path = path
+        if os.path.exists(path) and os.path.getsize(path):
+            self._file = open(path, "r+b")
+            if self._file.read(len(MAGIC)) != MAGIC:
+                self._file.close()
+                raise ValueError("Not a game record file: {}".format(path))
+            self._file.truncate(_record_ends(self._file))
+            self._file.seek(0, os.SEEK_END)
+        else:
+            self._file = open(path, "wb")
+            self._file.write(MAGIC)
+            self._file.flush()
+
+    def write(self, record):
+        """Append a `GameRecord` to the file. Raises ValueError if the board
+        has more than 256 cells, or if the record holds both move times and
+        search statistics for different numbers of searches.
+        """
+        width, height = record.width, record.height
+        if width * height > 256:
+            raise ValueError("Boards of more than 256 cells cannot be recorded")
+        if (record.move_times is not None and record.stats is not None and
+                len(record.move_times) != len(record.stats)):
+            raise ValueError("Got {} move times but {} search stats".format(
+                len(record.move_times), len(record.stats)))
+        searches = (record.move_times if record.move_times is not None else
+                    record.stats if record.stats is not None else ())
+        flags = ((HAS_TIMES if record.move_times is not None else 0) |
+                 (HAS_STATS if record.stats is not None else 0))
+
+        body = bytearray()
+        for name in record.players:
+            encoded = str(name).encode("utf-8")[:255]
+            body.append(len(encoded))
+            body += encoded
+        body += bytes(row + col * height for row, col in record.moves)
+        if record.move_times is not None:
+            for ms in record.move_times:
+                body += TIME.pack(ms)
+        if record.stats is not None:
+            for stats in record.stats:
+                if stats is None:
+                    body += STATS.pack(0, 0, 0, 0, 0)
+                else:
+                    body += STATS.pack(
+                        1 | (2 if stats.endgame else 0), min(stats.depth, 255),
+                        min(stats.nodes, 0xFFFFFFFF),
+                        min(stats.leaves, 0xFFFFFFFF),
+                        min(stats.cutoffs, 0xFFFFFFFF))
+
+        header = HEADER.pack(
+            HEADER.size - 4 + len(body), width, height, flags,
+            TERMINATIONS.index(record.termination), record.winner,
+            record.opening, len(record.moves), len(searches), record.seed,
+            record.match)
+        self._file.write(header + body)
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+def read_records(path):
+    """Yield the `GameRecord` of every complete game in a record file, in
+    the order they were written, reading one game at a time.
+    """
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError("Not a game record file: {}".format(path))
+        while True:
+            header = f.read(HEADER.size)
+            if len(header) < HEADER.size:
+                return
+            (length, width, height, flags, termination, winner, opening,
+             num_moves, searches, seed, match) = HEADER.unpack(header)
+            data = f.read(length - (HEADER.size - 4))
+            if len(data) < length - (HEADER.size - 4):
+                # A record left unfinished by an interrupted writer
+                return
+
+            players = []
+            offset = 0
+            for _ in range(2):
+                size = data[offset]
+                players.append(data[offset + 1:offset + 1 + size].decode("utf-8"))
+                offset += 1 + size
+            cells = _cells(width, height)
+            moves = [cells[idx] for idx in data[offset:offset + num_moves]]
+            offset += num_moves
+
+            move_times = None
+            if flags & HAS_TIMES:
+                move_times = [ms for ms, in TIME.iter_unpack(
+                    data[offset:offset + searches * TIME.size])]
+                offset += searches * TIME.size
+            stats = None
+            if flags & HAS_STATS:
+                stats = [MoveStats(depth, nodes, leaves, cutoffs,
+                                   bool(bits & 2)) if bits & 1 else None
+                         for bits, depth, nodes, leaves, cutoffs in
+                         STATS.iter_unpack(
+                             data[offset:offset + searches * STATS.size])]
+
+            yield GameRecord(width, height, tuple(players), seed, match,
+                             TERMINATIONS[termination], winner, opening,
+                             moves, move_times, stats)
+
+
+def replay(record, player_1=None, player_2=None):
+    """Yield (board, move) for every move of a recorded game, where `board`
+    is the position the move was played from.
+
+    A single `Board` is updated in place between steps, so copy it to keep
+    a position. The players are the names in the record unless others are
+    given (or the names are equal, in which case "Player1" and "Player2"
+    are used).
+    """
+    if player_1 is None and player_2 is None:
+        player_1, player_2 = record.players
+        if player_1 == player_2:
+            player_1, player_2 = "Player1", "Player2"
+    game = Board(player_1, player_2, record.width, record.height)
+    for move in record.moves:
+        yield game, move
+        game.apply_move(move)
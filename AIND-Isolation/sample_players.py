@@ -8,6 +8,8 @@ own agent and example heuristic functions.
 
 from random import randint
 
+from isolation.isolation import position_tables
+
 
 def null_score(game, player):
     """This heuristic presumes no knowledge for non-terminal states, and
@@ -30,13 +32,7 @@ def null_score(game, player):
         The heuristic value of the current game state.
     """
 
-    if game.is_loser(player):
-        return float("-inf")
-
-    if game.is_winner(player):
-        return float("inf")
-
-    return 0.
+    return game.utility(player)
 
 
 def open_move_score(game, player):
@@ -59,13 +55,11 @@ def open_move_score(game, player):
     float
         The heuristic value of the current game state
     """
-    if game.is_loser(player):
-        return float("-inf")
-
-    if game.is_winner(player):
-        return float("inf")
+    utility, own_moves, _ = game.get_mobility(player)
+    if utility:
+        return utility
 
-    return float(len(game.get_legal_moves(player)))
+    return float(own_moves)
 
 
 def improved_score(game, player):
@@ -89,14 +83,9 @@ def improved_score(game, player):
     float
         The heuristic value of the current game state
     """
-    if game.is_loser(player):
-        return float("-inf")
-
-    if game.is_winner(player):
-        return float("inf")
-
-    own_moves = len(game.get_legal_moves(player))
-    opp_moves = len(game.get_legal_moves(game.get_opponent(player)))
+    utility, own_moves, opp_moves = game.get_mobility(player)
+    if utility:
+        return utility
     return float(own_moves - opp_moves)
 
 
@@ -122,15 +111,12 @@ def center_score(game, player):
     float
         The heuristic value of the current game state
     """
-    if game.is_loser(player):
-        return float("-inf")
-
-    if game.is_winner(player):
-        return float("inf")
+    utility = game.utility(player)
+    if utility:
+        return utility
 
-    w, h = game.width / 2., game.height / 2.
-    y, x = game.get_player_location(player)
-    return float((h - y)**2 + (w - x)**2)
+    tables = position_tables(game.width, game.height)
+    return float(tables.center_sq[game.get_index_cell(game.player_index(player))])
 
 
 class RandomPlayer():
@@ -11,13 +11,22 @@ players, and the players play each match twice -- once as the first player and
 once as the second player.  Randomizing the openings and switching the player
 order corrects for imbalances due to both starting position and initiative.
 """
+import argparse
+import csv
 import itertools
+import json
+import math
+import multiprocessing
+import os
 import random
+import statistics
 import warnings
 
 from collections import namedtuple
 
 from isolation import Board
+from isolation.book import OpeningBook
+from isolation.records import GameRecord, RecordWriter
 from sample_players import (RandomPlayer, open_move_score,
                             improved_score, center_score)
 from game_agent import (MinimaxPlayer, AlphaBetaPlayer, custom_score,
@@ -36,37 +45,277 @@ game_agent.py.
 
 Agent = namedtuple("Agent", ["player", "name"])
 
+SPRTResult = namedtuple("SPRTResult", ["decision", "llr", "bounds", "pairs",
+                                       "wins", "losses", "elo", "interval"])
 
-def play_round(cpu_agent, test_agents, win_counts, num_matches):
+
+GameResult = namedtuple("GameResult", ["winner", "termination", "stats",
+                                       "moves", "move_times"])
+
+
+def play_game(player_1, player_2, opening, time_limit=TIME_LIMIT, seed=None):
+    """Play a single game after applying the opening moves, and return a
+    `GameResult` holding the index of the winner (0 for player_1, 1 for
+    player_2), the reason the game ended, the search statistics logged by
+    each player during the game (empty for players that do not keep a
+    `stats_log`), the moves played after the opening, and the milliseconds
+    taken by each move.
+
+    If `seed` is given, the `random` module (which shuffles the moves of
+    `Board.get_legal_moves()` and drives `RandomPlayer`) is seeded with it
+    first, so that the game does not depend on the process it is played in.
+    """
+    if seed is not None:
+        random.seed(seed)
+    players = (player_1, player_2)
+    for player in players:
+        if hasattr(player, "stats_log"):
+            player.stats_log = []
+    game = Board(player_1, player_2)
+    for move in opening:
+        game.apply_move(move)
+    move_times = []
+    winner, moves, termination = game.play(time_limit=time_limit,
+                                           move_times=move_times)
+    for player in players:
+        if hasattr(player, "stop_pondering"):
+            player.stop_pondering()
+    stats = [getattr(player, "stats_log", []) for player in players]
+    return GameResult(int(winner is player_2), termination, stats, moves,
+                      move_times)
+
+
+def _play_game(args):
+    """Unpack the index and arguments of `play_game` for
+    `multiprocessing.Pool.imap_unordered`, and return the index with the
+    result.
+    """
+    index, game = args
+    return index, play_game(*game)
+
+
+def make_opening(seed, match):
+    """Return the random placements of both players that open every game of
+    match number `match` in a tournament with the given seed.
+    """
+    rng = random.Random("{}-{}".format(seed, match))
+    game = Board("Player1", "Player2")
+    opening = []
+    for _ in range(2):
+        move = rng.choice(sorted(game.get_legal_moves()))
+        game.apply_move(move)
+        opening.append(move)
+    return opening
+
+
+def game_key(record):
+    """Return the key identifying the game of a log record: the agent pair,
+    the seat of the test agent, the seed and match number, and the opening.
+    """
+    return (record["agent"], record["opponent"], record["seat"],
+            record["seed"], record["match"],
+            tuple(tuple(move) for move in record["opening"]))
+
+
+def game_record(record, result):
+    """Return the `GameRecord` of a game from its log record and the
+    `GameResult` of `play_game()`.
+    """
+    names = (record["agent"], record["opponent"])
+    opening = [tuple(move) for move in record["opening"]]
+    searches = {stats.move_count: stats for log in result.stats
+                for stats in log}
+    return GameRecord(  # play_game() uses the default 7x7 board
+        7, 7, names if record["seat"] == 1 else names[::-1], record["seed"],
+        record["match"], result.termination, result.winner, len(opening),
+        opening + [tuple(move) for move in result.moves], result.move_times,
+        [searches.get(len(opening) + idx)
+         for idx in range(len(result.move_times))])
+
+
+class GameLog(object):
+    """Append-only log of finished games, stored as one JSON record per line.
+
+    The records already in the file are loaded when the log is opened, so
+    that a tournament interrupted at any point can be run again with the
+    same configuration and only play the games that are missing. Each new
+    record is flushed to disk as soon as its game ends.
+
+    Parameters
+    ----------
+    path : str
+        The log file, which is created if it does not exist.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.records = {}
+        ends_with_newline = True
+        if os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    ends_with_newline = line.endswith("\n")
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # A line left unfinished by an interrupted run
+                        continue
+                    self.records[game_key(record)] = record
+        self._file = open(path, "a")
+        if not ends_with_newline:
+            self._file.write("\n")
+
+    def __contains__(self, key):
+        return key in self.records
+
+    def __getitem__(self, key):
+        return self.records[key]
+
+    def append(self, record):
+        """Write the record of a finished game to the log."""
+        self._file.write(json.dumps(record) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self.records[game_key(record)] = record
+
+    def close(self):
+        self._file.close()
+
+
+def physical_cores():
+    """Return the number of physical CPU cores available to this process.
+
+    Hyperthreads share execution units, so running one game per logical CPU
+    would slow every search down and make the per-move timing unfair. Falls
+    back to the logical CPU count where the topology cannot be read.
+    """
+    try:
+        available = len(os.sched_getaffinity(0))
+    except AttributeError:
+        available = os.cpu_count() or 1
+    cores = set()
+    try:
+        with open("/proc/cpuinfo") as f:
+            physical_id = None
+            for line in f:
+                key, _, value = line.partition(":")
+                key = key.strip()
+                if key == "physical id":
+                    physical_id = value.strip()
+                elif key == "core id":
+                    cores.add((physical_id, value.strip()))
+    except OSError:
+        pass
+    return max(1, min(available, len(cores) or available))
+
+
+def worker_count(processes):
+    """Return the number of worker processes to use for a `-p` option: one
+    per physical CPU core for 0, and otherwise `processes` capped, with a
+    warning, at the number of physical cores, since more workers than cores
+    would slow every search down and make the per-move timing unfair.
+    """
+    cores = physical_cores()
+    if not processes:
+        return cores
+    if processes > cores:
+        warnings.warn("{} processes requested, but only {} physical CPU cores "
+                      "are available; using {}".format(processes, cores, cores))
+        return cores
+    return processes
+
+
+def play_games(pairings, pool=None, stats=None, log=None, seed=0,
+               recorder=None):
+    """Play a pair of games, one from each seat, for every (agent, opponent,
+    match) triple in `pairings`, starting both from the opening of the
+    match, and return the log records of the games in order (the agent's
+    game as player 1 first).
+
+    Every game is seeded from `seed`, the match and the seat (see
+    `play_game()`), so the records do not depend on whether a pool is used.
+    Games already in the `GameLog` given as `log` are taken from it instead
+    of being played; the others are played (by the workers of `pool`, if
+    given) and appended to the log as soon as they end. If a `stats` list
+    is given, the search statistics of the agents are appended to it, and
+    if a `RecordWriter` is given as `recorder`, every game played is
+    written to it.
+    """
+    records = []
+    games = []
+    for agent, opponent, match in pairings:
+        opening = make_opening(seed, match)
+        for seat in (1, 2):
+            record = dict(agent=agent.name, opponent=opponent.name, seat=seat,
+                          seed=seed, match=match,
+                          opening=[list(move) for move in opening])
+            key = game_key(record)
+            if log is not None and key in log:
+                records.append(log[key])
+                continue
+            players = ((agent.player, opponent.player) if seat == 1 else
+                       (opponent.player, agent.player))
+            games.append((len(records), players + (
+                opening, TIME_LIMIT, "{}-{}-{}".format(seed, match, seat))))
+            records.append(record)
+
+    # play the missing games, logging each one as soon as it ends
+    if pool is None:
+        results = ((index, play_game(*game)) for index, game in games)
+    else:
+        results = pool.imap_unordered(_play_game, games, chunksize=1)
+    for index, result in results:
+        record = records[index]
+        record.update(won=result.winner == record["seat"] - 1,
+                      termination=result.termination,
+                      moves=[list(move) for move in result.moves],
+                      move_times=result.move_times)
+        if log is not None:
+            log.append(record)
+        if recorder is not None:
+            recorder.write(game_record(record, result))
+        if stats is not None:
+            for move_stats in result.stats[record["seat"] - 1]:
+                stats.append(dict(agent=record["agent"],
+                                  opponent=record["opponent"],
+                                  match=record["match"], seat=record["seat"],
+                                  won=record["won"], **move_stats._asdict()))
+    return records
+
+
+def play_round(cpu_agent, test_agents, win_counts, num_matches, pool=None,
+               stats=None, log=None, seed=0, recorder=None):
     """Compare the test agents to the cpu agent in "fair" matches.
 
     "Fair" matches use random starting locations and force the agents to
     play as both first and second player to control for advantages resulting
     from choosing better opening moves or having first initiative to move.
+    The openings are drawn from `seed` (see `make_opening()`), so every
+    opponent faces the same openings.
+
+    If a `multiprocessing.Pool` is given, the games are played in parallel
+    by its workers; every game in a match still shares the same opening.
+    If a `stats` list is given, a record of the search statistics for every
+    move of the test agents is appended to it. If a `GameLog` is given,
+    every finished game is recorded in it, and games already in the log are
+    counted from their records instead of being played again. Games played
+    are also written to the `RecordWriter` given as `recorder`.
     """
     timeout_count = 0
     forfeit_count = 0
-    for _ in range(num_matches):
-
-        games = sum([[Board(cpu_agent.player, agent.player),
-                      Board(agent.player, cpu_agent.player)]
-                    for agent in test_agents], [])
 
-        # initialize all games with a random move and response
-        for _ in range(2):
-            move = random.choice(games[0].get_legal_moves())
-            for game in games:
-                game.apply_move(move)
+    pairings = [(agent, cpu_agent, match) for match in range(num_matches)
+                for agent in test_agents]
+    records = play_games(pairings, pool, stats, log, seed, recorder)
 
-        # play all games and tally the results
-        for game in games:
-            winner, _, termination = game.play(time_limit=TIME_LIMIT)
-            win_counts[winner] += 1
-
-            if termination == "timeout":
-                timeout_count += 1
-            elif termination == "forfeit":
-                forfeit_count += 1
+    # tally the results
+    agents = {agent.name: agent.player for agent in test_agents}
+    for record in records:
+        winner = agents[record["agent"]] if record["won"] else cpu_agent.player
+        win_counts[winner] += 1
+        if record["termination"] == "timeout":
+            timeout_count += 1
+        elif record["termination"] == "forfeit":
+            forfeit_count += 1
 
     return timeout_count, forfeit_count
 
@@ -77,8 +326,35 @@ def update(total_wins, wins):
     return total_wins
 
 
-def play_matches(cpu_agents, test_agents, num_matches):
-    """Play matches between the test agent and each cpu_agent individually. """
+def write_stats(stats, path):
+    """Write search statistics records to a CSV file if `path` ends with
+    ".csv", and to a JSON file otherwise.
+    """
+    with open(path, "w", newline="") as f:
+        if not path.endswith(".csv"):
+            json.dump(stats, f, indent=1)
+        elif stats:
+            writer = csv.DictWriter(f, fieldnames=list(stats[0]))
+            writer.writeheader()
+            for record in stats:
+                row = dict(record)
+                row["iteration_times"] = " ".join(
+                    "{:.3f}".format(ms) for ms in record["iteration_times"])
+                writer.writerow(row)
+
+
+def play_matches(cpu_agents, test_agents, num_matches, processes=1,
+                 stats=None, log=None, seed=0, recorder=None):
+    """Play matches between the test agent and each cpu_agent individually.
+
+    With `processes` greater than one, the games of each round are spread
+    over a pool of that many worker processes. If a `stats` list is given,
+    the search statistics of the test agents are appended to it. Games are
+    recorded in, and resumed from, the `GameLog` given as `log`, and their
+    openings are drawn from `seed`. Games played are also written to the
+    `RecordWriter` given as `recorder`.
+    """
+    pool = multiprocessing.Pool(processes) if processes > 1 else None
     total_wins = {agent.player: 0 for agent in test_agents}
     total_timeouts = 0.
     total_forfeits = 0.
@@ -93,7 +369,8 @@ def play_matches(cpu_agents, test_agents, num_matches):
 
         print("{!s:^9}{:^13}".format(idx + 1, agent.name), end="", flush=True)
 
-        counts = play_round(agent, test_agents, wins, num_matches)
+        counts = play_round(agent, test_agents, wins, num_matches, pool, stats,
+                            log, seed, recorder)
         total_timeouts += counts[0]
         total_forfeits += counts[1]
         total_wins = update(total_wins, wins)
@@ -106,6 +383,10 @@ def play_matches(cpu_agents, test_agents, num_matches):
             ) for i in range(0, len(round_totals), 2)
         ]))
 
+    if pool is not None:
+        pool.close()
+        pool.join()
+
     print("-" * 74)
     print('{:^9}{:^13}'.format("", "Win Rate:") +
         ''.join([
@@ -124,33 +405,222 @@ def play_matches(cpu_agents, test_agents, num_matches):
                "legal moves available to play.\n").format(total_forfeits))
 
 
+def expected_score(elo):
+    """Return the expected score of a player `elo` points stronger than its
+    opponent under the logistic Elo model.
+    """
+    return 1. / (1. + 10. ** (-elo / 400.))
+
+
+def elo_difference(score):
+    """Return the Elo difference implied by an expected score (the inverse
+    of `expected_score()`).
+    """
+    if score <= 0.:
+        return float("-inf")
+    if score >= 1.:
+        return float("inf")
+    return 400. * math.log10(score / (1. - score))
+
+
+def sprt_llr(wins, losses, elo0, elo1):
+    """Return the log-likelihood ratio of the hypotheses that the candidate
+    is `elo1` (H1) or `elo0` (H0) points stronger, given its wins and losses.
+
+    Games are modelled as independent trials won with the expected score of
+    each hypothesis. Playing both seats from one opening cancels most of the
+    opening's bias, so pair results usually vary less than this model
+    assumes, which errs on the side of playing more games.
+    """
+    s0, s1 = expected_score(elo0), expected_score(elo1)
+    return wins * math.log(s1 / s0) + losses * math.log((1 - s1) / (1 - s0))
+
+
+def elo_interval(pair_scores, confidence=0.95):
+    """Return the Elo difference estimated from the mean score of a list of
+    game pairs (0, 0.5 or 1 each), and its confidence interval from the
+    normal approximation with the variance measured between pairs.
+
+    As in the Agresti-Coull interval for proportions, one lost and one won
+    pseudo pair are added to the scores. This pulls the estimate slightly
+    towards an even score and keeps the variance above zero, so identical
+    pair scores (e.g., all wins or all splits) still give an interval of
+    useful width instead of a single point.
+    """
+    pair_scores = list(pair_scores) + [0., 1.]
+    n = len(pair_scores)
+    mean = sum(pair_scores) / n
+    variance = sum((x - mean) ** 2 for x in pair_scores) / max(1, n - 1)
+    z = statistics.NormalDist().inv_cdf((1 + confidence) / 2)
+    margin = z * math.sqrt(variance / n)
+    return elo_difference(mean), (elo_difference(mean - margin),
+                                  elo_difference(mean + margin))
+
+
+def run_sprt(candidate, baseline, elo0, elo1, alpha=0.05, beta=0.05,
+             max_pairs=1000, processes=1, stats=None, log=None, seed=0,
+             confidence=0.95, recorder=None):
+    """Play game pairs between two agents until a sequential probability
+    ratio test decides between H0 (the candidate is at most `elo0` points
+    stronger than the baseline) and H1 (at least `elo1` points stronger),
+    with false positive rate `alpha` and false negative rate `beta`.
+
+    Each pair plays both seats from the same opening. With `processes`
+    greater than one, that many pairs are played in parallel between two
+    tests. Games are recorded in, and resumed from, the `GameLog` given as
+    `log`, and games played are written to the `RecordWriter` given as
+    `recorder`. Returns an `SPRTResult` whose decision is "H0", "H1", or None if
+    `max_pairs` were played without a decision.
+    """
+    pool = multiprocessing.Pool(processes) if processes > 1 else None
+    bounds = (math.log(beta / (1 - alpha)), math.log((1 - beta) / alpha))
+    pair_scores = []
+    wins = losses = 0
+    llr = 0.
+    decision = None
+    while decision is None and len(pair_scores) < max_pairs:
+        first = len(pair_scores)
+        pairings = [(candidate, baseline, match) for match in
+                    range(first, min(max_pairs, first + processes))]
+        records = play_games(pairings, pool, stats, log, seed, recorder)
+        for pair in zip(records[::2], records[1::2]):
+            won = sum(record["won"] for record in pair)
+            wins += won
+            losses += 2 - won
+            pair_scores.append(won / 2.)
+        llr = sprt_llr(wins, losses, elo0, elo1)
+        print("{:>6} pairs  {:>5} - {:<5} LLR {:+.2f} [{:+.2f}, {:+.2f}]".format(
+            len(pair_scores), wins, losses, llr, *bounds), flush=True)
+        if llr <= bounds[0]:
+            decision = "H0"
+        elif llr >= bounds[1]:
+            decision = "H1"
+
+    if pool is not None:
+        pool.close()
+        pool.join()
+    elo, interval = elo_interval(pair_scores, confidence)
+    return SPRTResult(decision, llr, bounds, len(pair_scores), wins, losses,
+                      elo, interval)
+
+
 def main():
+    parser = argparse.ArgumentParser(description=DESCRIPTION)
+    parser.add_argument(
+        "-p", "--processes", type=int, default=1,
+        help="number of games to play in parallel, at most one per physical "
+             "CPU core; 0 uses one process per core (default: 1)")
+    parser.add_argument(
+        "--stats", metavar="FILE",
+        help="write the search statistics of every move made by the test "
+             "agents to FILE (CSV if it ends with .csv, JSON otherwise)")
+    parser.add_argument(
+        "--book", metavar="FILE",
+        help="let every search agent play the moves of the opening book in "
+             "FILE (see build_book.py)")
+    parser.add_argument(
+        "--log", metavar="FILE",
+        help="append every finished game to the JSON lines log FILE; games "
+             "already in the log are not played again")
+    parser.add_argument(
+        "--record", metavar="FILE",
+        help="append every game played to the binary game record file FILE "
+             "(see isolation/records.py)")
+    parser.add_argument(
+        "--seed", type=int, default=0,
+        help="random seed for the openings (default: 0)")
+    sprt = parser.add_argument_group(
+        "sequential test", "Instead of the round-robin tournament, play game "
+        "pairs between two agents until a sequential probability ratio test "
+        "accepts H0 (Elo difference <= ELO0) or H1 (Elo difference >= ELO1).")
+    sprt.add_argument(
+        "--sprt", nargs=2, metavar=("CANDIDATE", "BASELINE"),
+        help="names of the agents to compare, e.g. AB_Custom AB_Improved")
+    sprt.add_argument("--elo0", type=float, default=0.,
+                      help="Elo difference under H0 (default: 0)")
+    sprt.add_argument("--elo1", type=float, default=50.,
+                      help="Elo difference under H1 (default: 50)")
+    sprt.add_argument("--alpha", type=float, default=0.05,
+                      help="probability of accepting H1 when H0 holds "
+                           "(default: 0.05)")
+    sprt.add_argument("--beta", type=float, default=0.05,
+                      help="probability of accepting H0 when H1 holds "
+                           "(default: 0.05)")
+    sprt.add_argument("--max-pairs", type=int, default=1000,
+                      help="stop without a decision after this many game "
+                           "pairs (default: 1000)")
+    sprt.add_argument("--confidence", type=float, default=0.95,
+                      help="confidence level of the reported Elo interval "
+                           "(default: 0.95)")
+    args = parser.parse_args()
+    processes = worker_count(args.processes)
+    stats = [] if args.stats else None
+    book = OpeningBook(args.book) if args.book else None
+    log = GameLog(args.log) if args.log else None
+    recorder = RecordWriter(args.record) if args.record else None
 
     # Define two agents to compare -- these agents will play from the same
     # starting position against the same adversaries in the tournament
     test_agents = [
-        Agent(AlphaBetaPlayer(score_fn=improved_score), "AB_Improved"),
-        Agent(AlphaBetaPlayer(score_fn=custom_score), "AB_Custom"),
-        Agent(AlphaBetaPlayer(score_fn=custom_score_2), "AB_Custom_2"),
-        Agent(AlphaBetaPlayer(score_fn=custom_score_3), "AB_Custom_3")
+        Agent(AlphaBetaPlayer(score_fn=improved_score, book=book), "AB_Improved"),
+        Agent(AlphaBetaPlayer(score_fn=custom_score, book=book), "AB_Custom"),
+        Agent(AlphaBetaPlayer(score_fn=custom_score_2, book=book), "AB_Custom_2"),
+        Agent(AlphaBetaPlayer(score_fn=custom_score_3, book=book), "AB_Custom_3")
     ]
 
     # Define a collection of agents to compete against the test agents
     cpu_agents = [
         Agent(RandomPlayer(), "Random"),
-        Agent(MinimaxPlayer(score_fn=open_move_score), "MM_Open"),
-        Agent(MinimaxPlayer(score_fn=center_score), "MM_Center"),
-        Agent(MinimaxPlayer(score_fn=improved_score), "MM_Improved"),
-        Agent(AlphaBetaPlayer(score_fn=open_move_score), "AB_Open"),
-        Agent(AlphaBetaPlayer(score_fn=center_score), "AB_Center"),
-        Agent(AlphaBetaPlayer(score_fn=improved_score), "AB_Improved")
+        Agent(MinimaxPlayer(score_fn=open_move_score, book=book), "MM_Open"),
+        Agent(MinimaxPlayer(score_fn=center_score, book=book), "MM_Center"),
+        Agent(MinimaxPlayer(score_fn=improved_score, book=book), "MM_Improved"),
+        Agent(AlphaBetaPlayer(score_fn=open_move_score, book=book), "AB_Open"),
+        Agent(AlphaBetaPlayer(score_fn=center_score, book=book), "AB_Center"),
+        Agent(AlphaBetaPlayer(score_fn=improved_score, book=book), "AB_Improved")
     ]
 
+    if args.sprt:
+        agents = {agent.name: agent for agent in cpu_agents + test_agents}
+        unknown = [name for name in args.sprt if name not in agents]
+        if unknown or args.sprt[0] == args.sprt[1]:
+            parser.error("--sprt needs two different agents among: " +
+                         ", ".join(sorted(agents)))
+        candidate, baseline = (agents[name] for name in args.sprt)
+        print("SPRT {} vs {}: H0 Elo <= {:g}, H1 Elo >= {:g}, alpha {:g}, "
+              "beta {:g}\n".format(candidate.name, baseline.name, args.elo0,
+                                   args.elo1, args.alpha, args.beta))
+        result = run_sprt(candidate, baseline, args.elo0, args.elo1,
+                          args.alpha, args.beta, args.max_pairs, processes,
+                          stats, log, args.seed, args.confidence, recorder)
+        if result.decision is None:
+            print("\nNo decision after {} pairs".format(result.pairs))
+        else:
+            print("\n{} accepted after {} pairs".format(result.decision,
+                                                       result.pairs))
+        print("Elo difference: {:+.1f} ({:g}% interval {:+.1f} to {:+.1f})"
+              .format(result.elo, 100 * args.confidence, *result.interval))
+        if stats is not None:
+            write_stats(stats, args.stats)
+        if log is not None:
+            log.close()
+        if recorder is not None:
+            recorder.close()
+        return
+
     print(DESCRIPTION)
     print("{:^74}".format("*************************"))
     print("{:^74}".format("Playing Matches"))
     print("{:^74}".format("*************************"))
-    play_matches(cpu_agents, test_agents, NUM_MATCHES)
+    play_matches(cpu_agents, test_agents, NUM_MATCHES, processes, stats, log,
+                 args.seed, recorder)
+
+    if log is not None:
+        log.close()
+    if recorder is not None:
+        recorder.close()
+
+    if stats is not None:
+        write_stats(stats, args.stats)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,218 @@
+"""Tune the weights of a heuristic by self-play with SPSA.
+
+The heuristic is a `game_agent.WeightedScore`, starting from the weights of
+one of the hand-written heuristics (or from weights given on the command
+line). Each iteration of simultaneous perturbation stochastic approximation
+(SPSA) perturbs every tuned weight by +/- c_k at random, plays game pairs
+between an `AlphaBetaPlayer` using the weights plus the perturbation and
+one using the weights minus it (both seats from the same opening), and
+moves the weights along the perturbation in proportion to the score
+difference, with the step a_k. The gains decay as in Spall's recommended
+schedule: a_k = a / (k + 1 + A) ** 0.602 and c_k = c / (k + 1) ** 0.101.
+
+The games of each iteration are spread over a process pool, and every game
+is seeded, so a run does not depend on the number of processes. The state,
+including that of the random generator drawing the perturbations, is
+written to a JSON checkpoint after every iteration, so an interrupted run
+continues exactly where it stopped when started again with the same
+checkpoint.
+At the end, the tuned weights play a verification match against the
+starting weights and the Elo difference is reported with a confidence
+interval.
+
+Example:
+
+    python tune.py --start custom_score --iterations 200 -p 0
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+
+from game_agent import AlphaBetaPlayer, WeightedScore
+from tournament import (TIME_LIMIT, elo_interval, make_opening, play_game,
+                        worker_count)
+
+# The hand-written heuristics of game_agent.py as WeightedScore weights
+STARTING_WEIGHTS = {
+    "custom_score": dict(own_moves=1.5, center_sq=-1.75, pair_sq=-0.7),
+    "custom_score_2": dict(center_sq=-1.75, pair_sq=-1.),
+    "custom_score_3": dict(own_moves=1.5, center_abs=-1.),
+    "improved_score": dict(own_moves=1., opp_moves=-1.),
+}
+
+ALPHA = 0.602  # decay exponent of the step size a_k
+GAMMA = 0.101  # decay exponent of the perturbation size c_k
+
+
+def gains(config, k):
+    """Return the step size a_k and the perturbation size c_k of iteration
+    `k` (counted from zero) for the configuration of a run.
+    """
+    a_k = config["a"] / (k + 1 + 0.1 * config["iterations"]) ** ALPHA
+    c_k = config["c"] / (k + 1) ** GAMMA
+    return a_k, c_k
+
+
+def play_pair(args):
+    """Play both seats of one opening between two weight settings and return
+    the number of games (0, 1 or 2) won by the first.
+    """
+    weights, other_weights, opening, time_limit, nodes, seed = args
+    player = AlphaBetaPlayer(score_fn=WeightedScore(**weights), node_limit=nodes)
+    other = AlphaBetaPlayer(score_fn=WeightedScore(**other_weights),
+                            node_limit=nodes)
+    first = play_game(player, other, opening, time_limit, seed + "-1")
+    second = play_game(other, player, opening, time_limit, seed + "-2")
+    return (first.winner == 0) + (second.winner == 1)
+
+
+def play_pairs(pool, weights, other_weights, seed, first_match, pairs,
+               time_limit, nodes):
+    """Play game pairs from the openings `first_match` onwards and return the
+    list of pair scores (0, 0.5 or 1) of `weights`.
+    """
+    tasks = [(weights, other_weights, make_opening(seed, match), time_limit,
+              nodes, "{}-{}".format(seed, match))
+             for match in range(first_match, first_match + pairs)]
+    results = pool.map(play_pair, tasks, chunksize=1) if pool else map(play_pair, tasks)
+    return [won / 2. for won in results]
+
+
+def save_checkpoint(path, state):
+    """Write the tuner state to `path` atomically, so that an interruption
+    never leaves a truncated checkpoint.
+    """
+    temp = path + ".tmp"
+    with open(temp, "w") as f:
+        json.dump(state, f, indent=1)
+    os.replace(temp, path)
+
+
+def spsa(state, pool, pairs, time_limit, nodes, checkpoint=None):
+    """Run the remaining SPSA iterations of `state` (a dict as stored in the
+    checkpoint), updating it in place, and return it.
+    """
+    config = state["config"]
+    names = config["features"]
+    rng = random.Random("{}-spsa".format(config["seed"]))
+    if state.get("rng") is not None:
+        version, internal, gauss = state["rng"]
+        rng.setstate((version, tuple(internal), gauss))
+
+    while state["iteration"] < config["iterations"]:
+        k = state["iteration"]
+        a_k, c_k = gains(config, k)
+        bits = rng.getrandbits(len(names))
+        delta = [1 if bits >> i & 1 else -1 for i in range(len(names))]
+
+        weights = dict(state["weights"])
+        plus, minus = dict(weights), dict(weights)
+        for name, d in zip(names, delta):
+            plus[name] += c_k * d
+            minus[name] -= c_k * d
+        scores = play_pairs(pool, plus, minus, config["seed"], k * pairs, pairs,
+                            time_limit, nodes)
+
+        # The score of plus against minus, centered on zero, estimates the
+        # directional derivative along delta
+        diff = 2 * sum(scores) / len(scores) - 1
+        for name, d in zip(names, delta):
+            weights[name] += a_k * diff / (2 * c_k) * d
+        state["weights"] = weights
+        state["iteration"] = k + 1
+        state["rng"] = list(rng.getstate())
+        state["history"].append({"iteration": k + 1, "score": diff,
+                                 "weights": weights})
+        print("{:>5}  {:+.2f}  {}".format(k + 1, diff, "  ".join(
+            "{}={:+.3f}".format(name, weights[name]) for name in names)),
+            flush=True)
+        if checkpoint:
+            save_checkpoint(checkpoint, state)
+    return state
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--start", choices=sorted(STARTING_WEIGHTS),
+                        default="custom_score",
+                        help="heuristic whose weights are tuned (default: "
+                             "custom_score)")
+    parser.add_argument("--weights", metavar="NAME=VALUE", nargs="+",
+                        default=[],
+                        help="override or add starting weights, e.g. "
+                             "opp_moves=-0.5; every weight that is nonzero or "
+                             "given here is tuned. Features: " +
+                             ", ".join(WeightedScore.FEATURES))
+    parser.add_argument("--iterations", type=int, default=200,
+                        help="number of SPSA iterations (default: 200)")
+    parser.add_argument("--pairs", type=int, default=8,
+                        help="game pairs per iteration (default: 8)")
+    parser.add_argument("-a", type=float, default=0.2,
+                        help="step size scale a (default: 0.2)")
+    parser.add_argument("-c", type=float, default=0.25,
+                        help="perturbation size scale c (default: 0.25)")
+    parser.add_argument("--time-limit", type=float, default=TIME_LIMIT,
+                        help="milliseconds per move (default: {})".format(TIME_LIMIT))
+    parser.add_argument("--nodes", type=int,
+                        help="also limit each search to this many nodes")
+    parser.add_argument("--verify-pairs", type=int, default=100,
+                        help="game pairs of the final match between the tuned "
+                             "and the starting weights (default: 100)")
+    parser.add_argument("--checkpoint", metavar="FILE", default="tune.json",
+                        help="state file written after every iteration and "
+                             "resumed from if it exists (default: tune.json)")
+    parser.add_argument("--seed", type=int, default=0,
+                        help="random seed for the openings and perturbations")
+    parser.add_argument("-p", "--processes", type=int, default=1,
+                        help="number of games to play in parallel, at most "
+                             "one per physical CPU core; 0 uses one process "
+                             "per core")
+    args = parser.parse_args()
+
+    start = dict(STARTING_WEIGHTS[args.start])
+    for item in args.weights:
+        name, _, value = item.partition("=")
+        if name not in WeightedScore.FEATURES:
+            parser.error("unknown feature: {}".format(name))
+        start[name] = float(value)
+    config = {"start": {name: start.get(name, 0.) for name in WeightedScore.FEATURES},
+              "features": sorted(start, key=WeightedScore.FEATURES.index),
+              "iterations": args.iterations, "pairs": args.pairs,
+              "a": args.a, "c": args.c, "seed": args.seed}
+
+    state = {"config": config, "iteration": 0, "weights": dict(config["start"]),
+             "rng": None, "history": []}
+    if os.path.exists(args.checkpoint):
+        with open(args.checkpoint) as f:
+            saved = json.load(f)
+        if saved["config"] != config:
+            parser.error("{} was written with a different configuration; "
+                         "remove it or pass another --checkpoint".format(
+                             args.checkpoint))
+        state = saved
+        print("Resuming from iteration {}".format(state["iteration"]))
+
+    processes = worker_count(args.processes)
+    pool = multiprocessing.Pool(processes) if processes > 1 else None
+    spsa(state, pool, args.pairs, args.time_limit, args.nodes, args.checkpoint)
+
+    # Verify on openings that were not used for tuning
+    first_match = args.iterations * args.pairs
+    scores = play_pairs(pool, state["weights"], config["start"], args.seed,
+                        first_match, args.verify_pairs, args.time_limit,
+                        args.nodes)
+    if pool is not None:
+        pool.close()
+        pool.join()
+
+    elo, (low, high) = elo_interval(scores)
+    print("\nTuned weights:    {!r}".format(WeightedScore(**state["weights"])))
+    print("Starting weights: {!r}".format(WeightedScore(**config["start"])))
+    print("Elo gain over {} pairs: {:+.1f} (95% interval {:+.1f} to {:+.1f})"
+          .format(len(scores), elo, low, high))
+
+
+if __name__ == "__main__":
+    main()